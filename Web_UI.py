@@ -1,12 +1,40 @@
 import os
 import re
 import sys
+import json
+import uuid
 import pymysql
+import time
 import hashlib
+import functools
+import inspect
+import contextlib
 import streamlit as st
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
+
+from db_pool import ConnectionPool, PoolGroup
+from query_executor import ReadOnlyExecutor, READ_ONLY_INIT_COMMAND, extract_sql
+from result_store import store_rows, read_page, export_csv, prune_results
+from write_behind import TelemetryWriter, resolve, settled, dropped
+from pdf_extraction import PdfExtractor
+from rag_indexing import IncrementalIndexer
+from upload_store import store_upload
+from agent_streaming import AgentRun, AgentCancelled
+from answer_cache import AnswerCache
+from turn_timing import TurnTimer
+from user_cache import UserCache
+from schema_cache import SchemaCache
+from pipeline_registry import PipelineRegistry, SwitchGate, initialize_with_env
+from chat_history import HistoryManager
+from chat_export import EXPORT_FORMATS, iter_export, export_to_file
+from conversation_store import ConversationStore, serialize_sources
+from conversation_index import ConversationIndex, new_ulid
+from session_manager import SessionManager
+from passwords import PasswordHasher, PasswordHashBusy, hasher_from_spec
+from metrics import REGISTRY, SessionTracker, start_http_server, start_file_dump
+import profiling
 
 # ------------------------
 # Load environment variables
@@ -16,12 +44,88 @@ load_dotenv()
 # Ensure src is in sys.path for import
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
 from _1_Inference.rag_pipeline import run_agent, rag_pipeline
+import _1_Inference.rag_pipeline as rag_module
+
+# ------------------- Metrics -------------------
+# Get-or-create, so reruns of this script keep recording into the same metrics
+DB_HELPER_SECONDS = REGISTRY.histogram("chatbot_db_helper_seconds", "Latency of app database helpers by function")
+TELEMETRY_WRITE_SECONDS = REGISTRY.histogram("chatbot_telemetry_write_seconds", "Latency of write-behind INSERTs by table (and of their commits)")
+AGENT_SECONDS = REGISTRY.histogram("chatbot_agent_seconds", "run_agent latency (cache misses only)")
+TURN_SECONDS = REGISTRY.histogram("chatbot_turn_seconds", "End-to-end chat turn latency")
+PDF_PAGES = REGISTRY.counter("chatbot_pdf_pages_extracted_total", "PDF pages extracted and stored")
+PDF_PAGES_PER_SECOND = REGISTRY.histogram(
+    "chatbot_pdf_pages_per_second", "PDF extraction + ingestion throughput per upload",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+RAG_RELOAD_SECONDS = REGISTRY.histogram("chatbot_rag_reload_seconds", "Duration of full RAG document reloads")
+
+def db_timed(func):
+    """
+    Decorator recording a DB helper's latency in chatbot_db_helper_seconds.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with DB_HELPER_SECONDS.time(function=func.__name__), profiling.section(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+@st.cache_resource
+def get_session_tracker():
+    """
+    Process-wide tracker of recently active sessions.
+    """
+    return SessionTracker(window=float(os.getenv("METRICS_ACTIVE_SESSION_WINDOW", "300")))
+
+@st.cache_resource
+def start_metrics_exporters():
+    """
+    Register callback gauges and counters and start the exporters, once per process.
+    METRICS_PORT serves /metrics on localhost; METRICS_FILE dumps periodically.
+    """
+    REGISTRY.gauge("chatbot_active_sessions", "Sessions active in the last window", fn=get_session_tracker().active)
+    REGISTRY.gauge("chatbot_answer_cache_hit_ratio", "Answer cache hit ratio", fn=lambda: get_answer_cache().stats()["hit_ratio"])
+    REGISTRY.gauge("chatbot_user_cache_hit_ratio", "User record cache hit ratio", fn=lambda: get_user_cache().stats()["hit_ratio"])
+    REGISTRY.gauge("chatbot_app_db_pool_wait_avg_seconds", "Average app DB pool checkout wait", fn=lambda: get_app_db_pool().stats()["wait_avg_s"])
+    REGISTRY.gauge("chatbot_telemetry_queue_depth", "Telemetry rows waiting to be written", fn=lambda: get_telemetry_writer().stats()["queued"])
+    REGISTRY.counter("chatbot_telemetry_dropped_total", "Telemetry rows dropped because the write queue was full", fn=lambda: get_telemetry_writer().stats()["dropped"])
+    REGISTRY.gauge("chatbot_session_cache_hit_ratio", "Login session validation cache hit ratio", fn=lambda: get_session_manager().stats()["hit_ratio"])
+    REGISTRY.counter("chatbot_password_rehashes_total", "Stored password hashes upgraded at login", fn=lambda: get_password_hasher().stats()["rehashed"])
+    REGISTRY.counter("chatbot_slow_rerun_profiles_saved_total", "Profiles saved for reruns over PROFILE_SLOW_SECONDS", fn=lambda: get_profiler().saved)
+    exporters = {}
+    if os.getenv("METRICS_PORT"):
+        exporters["http"] = start_http_server(REGISTRY, int(os.getenv("METRICS_PORT")), host=os.getenv("METRICS_HOST", "127.0.0.1"))
+    if os.getenv("METRICS_FILE"):
+        exporters["file"] = start_file_dump(REGISTRY, os.getenv("METRICS_FILE"), interval=float(os.getenv("METRICS_FILE_INTERVAL", "15")))
+    return exporters
+
+# ------------------- Profiling -------------------
+# Off unless PROFILE=1 is set for the process or ?profile=1 is in a session's URL
+
+@st.cache_resource
+def get_profiler():
+    """
+    Process-wide sampling profiler. Reruns slower than PROFILE_SLOW_SECONDS are
+    saved as JSON stack summaries under PROFILE_DIR.
+    """
+    return profiling.SamplingProfiler(
+        out_dir=os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".profiles")),
+        interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+        threshold=float(os.getenv("PROFILE_SLOW_SECONDS", "2")),
+        top_n=int(os.getenv("PROFILE_TOP_N", "25")),
+        keep=int(os.getenv("PROFILE_KEEP", "200"))
+    )
+
+def profiling_enabled():
+    if os.getenv("PROFILE", "").lower() in ("1", "true", "yes"):
+        return True
+    return st.query_params.get("profile", "").lower() in ("1", "true", "yes")
 
 # ------------------- DB Helpers -------------------
 
 def get_app_db_connection():
     """
-    Get a connection to the application's own database (ml_proj_db).
+    Open a new connection to the application's own database (ml_proj_db).
+    Prefer get_app_db_pool().connection(), which reuses pooled connections.
     """
     return pymysql.connect(
         host="localhost",
@@ -32,123 +136,254 @@ def get_app_db_connection():
         cursorclass=pymysql.cursors.DictCursor
     )
 
-def get_user_db_connection():
+@st.cache_resource
+def get_app_db_pool():
     """
-    Get a connection to the user's query database (the one they want to query with SQL).
-    Returns a pymysql connection object or None if not connected.
+    Process-wide connection pool for ml_proj_db, shared by all Streamlit sessions.
+    Sizing can be tuned with the APP_DB_POOL_* environment variables.
     """
-    if not st.session_state.user_db_connection_details:
-        st.error("Please connect to a database first")
-        return None
-    try:
-        return pymysql.connect(
-            host=st.session_state.user_db_connection_details["host"],
-            port=int(st.session_state.user_db_connection_details["port"]),
-            user=st.session_state.user_db_connection_details["username"],
-            password=st.session_state.user_db_connection_details["password"],
-            database=st.session_state.user_db_connection_details["database"],
-            charset="utf8mb4",
-            cursorclass=pymysql.cursors.DictCursor
-        )
-    except Exception as e:
-        st.error(f"Database connection error: {str(e)}")
-        return None
+    return ConnectionPool(
+        get_app_db_connection,
+        max_size=int(os.getenv("APP_DB_POOL_SIZE", "10")),
+        max_age=float(os.getenv("APP_DB_POOL_MAX_AGE", "1800")),
+        ping_interval=float(os.getenv("APP_DB_POOL_PING_INTERVAL", "30")),
+        timeout=float(os.getenv("APP_DB_POOL_TIMEOUT", "10"))
+    )
 
-def test_user_db_connection(host, port, username, password, database):
+@st.cache_resource
+def get_telemetry_writer():
     """
-    Test connection to the user's query database.
-    Returns (True, message) if successful, (False, error message) otherwise.
+    Process-wide write-behind queue for chat telemetry (inputs, predictions,
+    execution results). Rows are written in batches off the request path;
+    their latency is recorded in chatbot_telemetry_write_seconds.
     """
-    try:
-        conn = pymysql.connect(
+    return TelemetryWriter(
+        get_app_db_pool(),
+        max_batch=int(os.getenv("TELEMETRY_MAX_BATCH", "200")),
+        flush_interval=float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "0.05")),
+        max_queue=int(os.getenv("TELEMETRY_MAX_QUEUE", "5000")),
+        latency=TELEMETRY_WRITE_SECONDS
+    )
+
+@st.cache_resource
+def get_conversation_store():
+    """
+    Process-wide conversation store on the app database pool; its tables are
+    created on first use.
+    """
+    store = ConversationStore(get_app_db_pool(), get_telemetry_writer())
+    store.ensure_schema()
+    return store
+
+@st.cache_resource
+def get_user_db_pools():
+    """
+    Process-wide connection pools for users' target databases, one per
+    distinct set of connection details (USER_DB_* env vars tune them).
+    Connections are opened in READ ONLY session mode.
+    """
+    return PoolGroup(
+        max_pools=int(os.getenv("USER_DB_MAX_POOLS", "32")),
+        max_size=int(os.getenv("USER_DB_POOL_SIZE", "5")),
+        max_age=float(os.getenv("USER_DB_POOL_MAX_AGE", "1800")),
+        timeout=float(os.getenv("USER_DB_POOL_TIMEOUT", "10"))
+    )
+
+def get_user_db_pool(host, port, username, password, database):
+    """
+    Connection pool for one user target database.
+    """
+    def connect():
+        return pymysql.connect(
             host=host,
             port=int(port),
             user=username,
             password=password,
             database=database,
             charset="utf8mb4",
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            init_command=READ_ONLY_INIT_COMMAND,
+            connect_timeout=10,
+            read_timeout=int(os.getenv("USER_DB_QUERY_TIMEOUT_MS", "30000")) // 1000 + 10
         )
-        # Test if we can get the schema
-        with conn.cursor() as cursor:
-            cursor.execute("SHOW TABLES")
-            tables = cursor.fetchall()
-        conn.close()
-        return True, f"Connection successful! Found {len(tables)} tables."
+    key = (host, str(port), username, hashlib.sha256(password.encode()).hexdigest(), database)
+    return get_user_db_pools().get(key, connect)
+
+def get_user_db_executor():
+    """
+    Read-only executor for generated SQL on the connected user database, with
+    statement timeout and row limit from USER_DB_QUERY_TIMEOUT_MS / USER_DB_MAX_ROWS.
+    Returns None if not connected.
+    """
+    if not st.session_state.user_db_connection_details:
+        return None
+    return ReadOnlyExecutor(
+        get_user_db_pool(**st.session_state.user_db_connection_details),
+        timeout_ms=int(os.getenv("USER_DB_QUERY_TIMEOUT_MS", "30000")),
+        max_rows=int(os.getenv("USER_DB_MAX_ROWS", "100000"))
+    )
+
+def test_user_db_connection(host, port, username, password, database):
+    """
+    Test connection to the user's query database.
+    Returns (True, message, schema_version) if successful,
+    (False, error message, None) otherwise.
+    """
+    try:
+        # Test if we can get the schema (served from the schema cache when unchanged)
+        with get_user_db_pool(host, port, username, password, database).connection() as conn:
+            schema = get_schema_cache().get(conn, host, port, database)
+        return True, f"Connection successful! Found {len(schema['tables'])} tables.", schema["version"]
     except Exception as e:
-        return False, f"Connection failed: {str(e)}"
+        return False, f"Connection failed: {str(e)}", None
+
+@st.cache_resource
+def get_schema_cache():
+    """
+    Process-wide schema metadata cache for users' target databases,
+    persisted under SCHEMA_CACHE_DIR (default: .schema_cache next to this file).
+    """
+    return SchemaCache(
+        os.getenv("SCHEMA_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".schema_cache")),
+        refresh_interval=float(os.getenv("SCHEMA_CACHE_REFRESH_INTERVAL", "60"))
+    )
+
+@st.cache_resource
+def get_password_hasher():
+    """
+    Process-wide password hasher. PASSWORD_HASH selects the scheme and cost for
+    new hashes (e.g. "scrypt$n=16384,r=8,p=1" or "pbkdf2_sha256$i=600000");
+    verification runs on PASSWORD_HASH_WORKERS threads.
+    """
+    return PasswordHasher(
+        hasher_from_spec(os.getenv("PASSWORD_HASH", "scrypt$n=16384,r=8,p=1")),
+        max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or None,
+        max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64")),
+        timeout=float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+    )
 
 def hash_password(password):
     """
-    Hash a password using SHA-256 for secure storage.
+    Hash a password with a per-password salt for secure storage.
     """
-    return hashlib.sha256(password.encode()).hexdigest()
+    return get_password_hasher().hash(password)
 
+@db_timed
 def create_user(username, email, password):
     """
     Create a new user in the application's own database.
-    Returns True if successful, False otherwise.
+    Returns the new user's id if successful, None otherwise.
     """
     try:
-        conn = get_app_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
-                (username, email, hash_password(password))
-            )
-        conn.commit()
-        return True
+        # Hashed before taking a pooled connection; the KDF is deliberately slow
+        password_hash = hash_password(password)
+        with get_app_db_pool().connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
+                    (username, email, password_hash)
+                )
+                user_id = cursor.lastrowid
+            conn.commit()
+        get_user_cache().invalidate(user_id)
+        return user_id
     except Exception as e:
         st.error(f"Error creating user: {str(e)}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        return None
 
+@db_timed
 def check_user(email, password):
     """
     Check user credentials against the application's own database.
     Returns user info if credentials are valid, None otherwise.
+    Legacy or outdated hashes are replaced after a successful check.
     """
+    passwords = get_password_hasher()
     try:
-        conn = get_app_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT id, name FROM users WHERE email=%s AND password_hash=%s",
-                (email, hash_password(password))
-            )
-            result = cursor.fetchone()
-            return result
+        with get_app_db_pool().connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, name, email, password_hash FROM users WHERE email=%s", (email,))
+                user = cursor.fetchone()
+        if user is None:
+            # Same hashing cost as a wrong password, so unknown emails can't be told apart
+            passwords.verify_dummy(password)
+            return None
+        stored = user.pop("password_hash")
+        ok, new_hash = passwords.verify(password, stored)
+        if not ok:
+            return None
+        if new_hash:
+            with get_app_db_pool().connection() as conn:
+                with conn.cursor() as cursor:
+                    # Only if no concurrent login has replaced it already
+                    cursor.execute(
+                        "UPDATE users SET password_hash=%s WHERE id=%s AND password_hash=%s",
+                        (new_hash, user["id"], stored)
+                    )
+                conn.commit()
+        get_user_cache().put(user)
+        return user
+    except PasswordHashBusy:
+        st.error("Too many sign-ins at the moment, please try again shortly.")
+        return None
     except Exception as e:
         st.error(f"Error checking credentials: {str(e)}")
         return None
-    finally:
-        if conn:
-            conn.close()
+
+@db_timed
+def load_user_record(user_id):
+    """
+    Read one user's record (id, name, email) from the application's own database.
+    """
+    with get_app_db_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id, name, email FROM users WHERE id=%s", (user_id,))
+            return cursor.fetchone()
+
+@st.cache_resource
+def get_user_cache():
+    """
+    Process-wide cache of user records, keyed by user id.
+    Call get_user_cache().invalidate(user_id) after changing an account.
+    """
+    return UserCache(load_user_record, ttl=float(os.getenv("USER_CACHE_TTL", "300")))
+
+@st.cache_resource
+def get_session_manager():
+    """
+    Process-wide login session store (user_sessions). Validations are cached
+    for SESSION_REVALIDATE_INTERVAL seconds; expired rows are swept every
+    SESSION_SWEEP_INTERVAL seconds.
+    """
+    return SessionManager(
+        get_app_db_pool(),
+        lifetime=float(os.getenv("SESSION_LIFETIME_HOURS", "24")) * 3600,
+        revalidate_interval=float(os.getenv("SESSION_REVALIDATE_INTERVAL", "60")),
+        sweep_interval=float(os.getenv("SESSION_SWEEP_INTERVAL", "300")),
+        sweep_batch=int(os.getenv("SESSION_SWEEP_BATCH", "1000"))
+    )
 
 # ------------------- DB Operations -------------------
 
+@db_timed
 def log_security_event(user_id, event_type, event_desc, ip_address=None):
     """
     Log a security event to the application's own database.
     """
-    conn = get_app_db_connection()
-    try:
+    with get_app_db_pool().connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 "INSERT INTO security_logs (user_id, event_type, event_dec, ip_address) VALUES (%s, %s, %s, %s)",
                 (user_id, event_type, event_desc, ip_address)
             )
         conn.commit()
-    finally:
-        conn.close()
 
+@db_timed
 def insert_input(user_id, input_type, input_txt=None, file_path=None):
     """
     Insert a new input record into the application's own database.
     """
-    conn = get_app_db_connection()
-    try:
+    with get_app_db_pool().connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 "INSERT INTO inputs (user_id, input_type, input_txt, file_path) VALUES (%s, %s, %s, %s)",
@@ -156,30 +391,67 @@ def insert_input(user_id, input_type, input_txt=None, file_path=None):
             )
             conn.commit()
             return cursor.lastrowid
-    finally:
-        conn.close()
 
+@db_timed
 def insert_document(input_id, content=None, page_number=None):
     """
     Insert a new document record into the application's own database.
     """
-    conn = get_app_db_connection()
-    try:
+    with get_app_db_pool().connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 "INSERT INTO documents (input_id, content, page_number) VALUES (%s, %s, %s)",
                 (input_id, content, page_number)
             )
             conn.commit()
-    finally:
-        conn.close()
 
+@db_timed
+def ingest_document(user_id, file_path, pages, input_txt=None, chunk_size=500):
+    """
+    Insert a file input and all of its pages in a single transaction.
+    pages is an iterable of (page_number, content) and may be a generator;
+    rows are sent with executemany in chunks of chunk_size.
+    If anything fails the whole document is rolled back and the error re-raised.
+    Returns (input_id, page_count, elapsed_seconds).
+    """
+    start = time.perf_counter()
+    page_count = 0
+    with get_app_db_pool().connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO inputs (user_id, input_type, input_txt, file_path) VALUES (%s, %s, %s, %s)",
+                    (user_id, "file", input_txt, file_path)
+                )
+                input_id = cursor.lastrowid
+                chunk = []
+                for page_number, content in pages:
+                    chunk.append((input_id, content, page_number))
+                    if len(chunk) >= chunk_size:
+                        cursor.executemany(
+                            "INSERT INTO documents (input_id, content, page_number) VALUES (%s, %s, %s)",
+                            chunk
+                        )
+                        page_count += len(chunk)
+                        chunk = []
+                if chunk:
+                    cursor.executemany(
+                        "INSERT INTO documents (input_id, content, page_number) VALUES (%s, %s, %s)",
+                        chunk
+                    )
+                    page_count += len(chunk)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return input_id, page_count, time.perf_counter() - start
+
+@db_timed
 def insert_prediction(input_id, generated_sql):
     """
     Insert a new prediction record into the application's own database.
     """
-    conn = get_app_db_connection()
-    try:
+    with get_app_db_pool().connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 "INSERT INTO predictions (input_id, generated_sql) VALUES (%s, %s)",
@@ -187,38 +459,32 @@ def insert_prediction(input_id, generated_sql):
             )
             conn.commit()
             return cursor.lastrowid
-    finally:
-        conn.close()
 
+@db_timed
 def insert_execution_result(prediction_id, result_json, execution_time, success, error_message=None):
     """
     Insert a new execution result record into the application's own database.
     """
-    conn = get_app_db_connection()
-    try:
+    with get_app_db_pool().connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 "INSERT INTO execution_result (prediction_id, result_json, execution_time, success, error_message) VALUES (%s, %s, %s, %s, %s)",
                 (prediction_id, result_json, execution_time, success, error_message)
             )
             conn.commit()
-    finally:
-        conn.close()
 
+@db_timed
 def insert_feedback(prediction_id, rating, comment=None):
     """
     Insert a new feedback record into the application's own database.
     """
-    conn = get_app_db_connection()
-    try:
+    with get_app_db_pool().connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 "INSERT INTO feedback (prediction_id, rating, comment) VALUES (%s, %s, %s)",
                 (prediction_id, rating, comment)
             )
             conn.commit()
-    finally:
-        conn.close()
 
 # ------------------- Session State Initialization -------------------
 # These variables help keep track of the user's session and app state.
@@ -226,14 +492,28 @@ def initialize_session_state():
     """Initialize all session state variables in one place."""
     if "current_user" not in st.session_state:
         st.session_state.current_user = None
+    if "current_user_id" not in st.session_state:
+        st.session_state.current_user_id = None  # Set at login; avoids per-message user lookups
     if "greeted" not in st.session_state:
         st.session_state.greeted = False
-    if "users_data" not in st.session_state:
-        st.session_state.users_data = {}  # Holds conversations per user
+    if "chats" not in st.session_state:
+        st.session_state.chats = None  # Conversation headers and the open chat's messages (see get_user_chats)
     if "user_db_connected" not in st.session_state:
         st.session_state.user_db_connected = False
     if "user_db_connection_details" not in st.session_state:
         st.session_state.user_db_connection_details = None
+    if "user_db_schema_version" not in st.session_state:
+        st.session_state.user_db_schema_version = None
+    if "last_upload_id" not in st.session_state:
+        st.session_state.last_upload_id = None
+    if "agent_run" not in st.session_state:
+        st.session_state.agent_run = None  # In-flight AgentRun, if any
+    if "session_key" not in st.session_state:
+        st.session_state.session_key = uuid.uuid4().hex  # Identifies this session to shared registries
+    if "rag_pipeline_key" not in st.session_state:
+        st.session_state.rag_pipeline_key = None
+    if "session_token" not in st.session_state:
+        st.session_state.session_token = None  # Login session token; never put in the URL
 
 # ------------------- Database Connection UI -------------------
 def user_database_connection_interface():
@@ -263,7 +543,7 @@ def user_database_connection_interface():
             if not all([host, port, username, password, database]):
                 st.error("Please fill in all fields")
             else:
-                success, message = test_user_db_connection(host, port, username, password, database)
+                success, message, schema_version = test_user_db_connection(host, port, username, password, database)
                 if success:
                     st.session_state.user_db_connection_details = {
                         "host": host,
@@ -272,29 +552,302 @@ def user_database_connection_interface():
                         "password": password,
                         "database": database
                     }
+                    st.session_state.user_db_schema_version = schema_version
                     st.session_state.user_db_connected = True
                     st.success(message)
-                    # Update MYSQL_URL environment variable for the RAG pipeline
-                    os.environ["MYSQL_URL"] = f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}"
-                    # Reload RAG pipeline with new connection
-                    rag_pipeline.initialize()
+                    # Lease a warm RAG pipeline for this database (built on first use)
+                    release_session_pipeline()
+                    get_session_pipeline()
                     st.rerun()
                 else:
                     st.error(message)
 
+# ------------------- RAG Pipelines -------------------
+@st.cache_resource
+def get_pipeline_registry():
+    """
+    Process-wide registry of warm RAG pipelines, one per target database.
+    Capped by RAG_MAX_PIPELINES and RAG_PIPELINES_MAX_MEMORY_MB.
+    """
+    return PipelineRegistry(
+        max_pipelines=int(os.getenv("RAG_MAX_PIPELINES", "8")),
+        max_memory_mb=int(os.getenv("RAG_PIPELINES_MAX_MEMORY_MB", "0")) or None,
+        lease_ttl=float(os.getenv("RAG_PIPELINE_LEASE_TTL", "3600"))
+    )
+
+def _accepts_pipeline(func):
+    try:
+        return "pipeline" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+# Per-database pipelines only help if the agent can be run on a given instance:
+# either the pipeline class has its own run_agent, or the module-level run_agent
+# takes the pipeline as an argument. Otherwise every answer comes from the
+# module-level rag_pipeline (see run_on_shared_pipeline).
+PER_PIPELINE_AGENTS = hasattr(type(rag_pipeline), "run_agent") or _accepts_pipeline(run_agent)
+
+@st.cache_resource
+def get_shared_pipeline_gate():
+    """
+    Which target database the module-level rag_pipeline is initialized for.
+    Runs on that database share it; switching waits for them to finish.
+    """
+    return SwitchGate()
+
+def get_pipeline_key(details):
+    """
+    Registry key for a target database (credentials other than the user name excluded).
+    """
+    return (details["host"], str(details["port"]), details["username"], details["database"])
+
+def get_pipeline_env(details):
+    """
+    Environment the RAG pipeline reads its database connection from.
+    """
+    return {
+        "MYSQL_URL": f"mysql+pymysql://{details['username']}:{details['password']}@{details['host']}:{details['port']}/{details['database']}"
+    }
+
+def build_rag_pipeline(details):
+    """
+    Build and initialize a new RAG pipeline instance for one target database,
+    with the module's create_pipeline() if it has one.
+    """
+    factory = getattr(rag_module, "create_pipeline", None) or type(rag_pipeline)
+    return initialize_with_env(factory(), get_pipeline_env(details))
+
+def get_session_pipeline():
+    """
+    The warm RAG pipeline for this session's connected database, leased from
+    the registry (and built if no other session has it warm).
+    Returns None if no database is connected or the agent cannot run on
+    separate pipeline instances.
+    """
+    details = st.session_state.user_db_connection_details
+    if not details or not PER_PIPELINE_AGENTS:
+        return None
+    key = get_pipeline_key(details)
+    registry = get_pipeline_registry()
+    pipeline = registry.get(key, st.session_state.session_key)
+    if pipeline is None:
+        pipeline = registry.acquire(key, st.session_state.session_key, lambda: build_rag_pipeline(details))
+    st.session_state.rag_pipeline_key = key
+    return pipeline
+
+def release_session_pipeline():
+    """
+    Give up this session's lease on its RAG pipeline, if any.
+    """
+    if st.session_state.rag_pipeline_key is not None:
+        get_pipeline_registry().release(st.session_state.rag_pipeline_key, st.session_state.session_key)
+        st.session_state.rag_pipeline_key = None
+
+def _locked(func, lock):
+    """
+    func run while holding lock.
+    """
+    if func is None:
+        return None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+def run_on_shared_pipeline(details, func):
+    """
+    Wrap an agent callable so it runs on the module-level rag_pipeline for
+    this session's database. Runs on the database the pipeline is set up for
+    proceed concurrently; one for another database waits for them to finish
+    and re-initializes the pipeline, so no run sees another session's
+    database.
+    """
+    if func is None:
+        return None
+    gate = get_shared_pipeline_gate()
+    key = get_pipeline_key(details) if details else None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with gate.use(key, lambda: initialize_with_env(rag_pipeline, get_pipeline_env(details))):
+            return func(*args, **kwargs)
+    return wrapper
+
+def get_session_agent():
+    """
+    Agent callables (run_agent, stream_agent or None) for this session's
+    database. Runs on one pipeline instance are serialized by that
+    pipeline's lock.
+    """
+    stream_agent = getattr(rag_module, "stream_agent", None)
+    pipeline = get_session_pipeline()
+    if pipeline is None:
+        details = st.session_state.user_db_connection_details
+        return run_on_shared_pipeline(details, run_agent), run_on_shared_pipeline(details, stream_agent)
+
+    lock = get_pipeline_registry().lock(st.session_state.rag_pipeline_key)
+    if hasattr(pipeline, "run_agent"):
+        return _locked(pipeline.run_agent, lock), _locked(getattr(pipeline, "stream_agent", None), lock)
+    stream_fn = functools.partial(stream_agent, pipeline=pipeline) if stream_agent and _accepts_pipeline(stream_agent) else None
+    return _locked(functools.partial(run_agent, pipeline=pipeline), lock), _locked(stream_fn, lock)
+
 # ------------------- Utilities -------------------
+# Only a bounded slice of a user's history is held in session state: the most
+# recent conversation headers and a window of the open chat's messages.
+CONVERSATION_PAGE_SIZE = int(os.getenv("CONVERSATION_PAGE_SIZE", "20"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+CHAT_WINDOW_MAX = int(os.getenv("CHAT_WINDOW_MAX", "200"))
+# Messages drawn per rerun; the rest are collapsed behind "load earlier"
+CHAT_VISIBLE_MESSAGES = int(os.getenv("CHAT_VISIBLE_MESSAGES", "20"))
+
 def get_user_chats():
     """
     Retrieve or initialize the current user's chat data from session state.
-    Returns a dict with conversations and current chat id.
+    Returns a dict with conversation headers (most recent first), the current
+    chat id and the message window of the open chat.
+    Headers are loaded from the conversation store a page at a time, as the
+    sidebar list needs them.
     """
-    user = st.session_state.current_user
-    if user not in st.session_state.users_data:
-        st.session_state.users_data[user] = {
-            "conversations": {},
-            "current_chat_id": None
+    user_id = st.session_state.current_user_id
+    chats = st.session_state.chats
+    if chats is None or chats["user_id"] != user_id:
+        chats = st.session_state.chats = {
+            "user_id": user_id,
+            "conversations": ConversationIndex(),
+            "headers_cursor": None,  # (updated_at, id) of the last header read from the store
+            "more_headers": True,
+            "list_query": "",
+            "list_page": 0,
+            "search": None,  # cached search results, see get_conversation_page
+            "current_chat_id": None,
+            "window": None
         }
-    return st.session_state.users_data[user]
+        load_more_headers(chats, CONVERSATION_PAGE_SIZE + 1)
+    return chats
+
+def load_more_headers(user_data, count):
+    """
+    Read up to count more conversation headers from the store.
+    """
+    rows = get_conversation_store().list_headers(user_data["user_id"], limit=count, before=user_data["headers_cursor"])
+    for h in rows:
+        # Conversations updated in this session keep their place further up
+        user_data["conversations"].append(h["id"], h["title"], h["created_at"], h["updated_at"])
+    if rows:
+        user_data["headers_cursor"] = (rows[-1]["updated_at"], rows[-1]["id"])
+    user_data["more_headers"] = len(rows) == count
+
+def get_conversation_page(user_data, query, page):
+    """
+    One page of the sidebar list as [(id, title)], plus whether a next page
+    exists. Searches run in the store and are cached until the query, the page
+    or the user's conversations change.
+    """
+    size = CONVERSATION_PAGE_SIZE
+    conversations = user_data["conversations"]
+    if query:
+        key = (query, page)
+        if user_data["search"] is None or user_data["search"]["key"] != key:
+            rows = get_conversation_store().search_headers(user_data["user_id"], query, limit=size + 1, offset=page * size)
+            user_data["search"] = {"key": key, "rows": [(h["id"], h["title"]) for h in rows]}
+        rows = user_data["search"]["rows"]
+        # Titles renamed in this session may not be written yet
+        rows = [(cid, conversations.get(cid)["title"] if cid in conversations else title) for cid, title in rows]
+        return rows[:size], len(rows) > size
+    needed = (page + 1) * size + 1
+    if len(conversations) < needed and user_data["more_headers"]:
+        load_more_headers(user_data, needed - len(conversations))
+    rows = [(cid, convo["title"]) for cid, convo in conversations.page(page * size, size + 1)]
+    return rows[:size], len(rows) > size
+
+def get_chat_window(user_data):
+    """
+    Messages of the open chat, loading its latest page on first access.
+    Returns the window dict described in new_chat_window.
+    """
+    chat_id = user_data["current_chat_id"]
+    window = user_data["window"]
+    if window is None or window["chat_id"] != chat_id:
+        messages, has_more = get_conversation_store().load_messages(
+            st.session_state.current_user_id, chat_id, limit=CHAT_PAGE_SIZE
+        )
+        window = user_data["window"] = new_chat_window(chat_id, messages, has_more)
+    settle_message_ids(window)
+    return window
+
+def new_chat_window(chat_id, messages=(), has_more=False):
+    """
+    Session-side state of an open chat: its loaded messages (at most
+    CHAT_WINDOW_MAX), whether older ones exist in the store and how many are
+    drawn.
+    """
+    return {
+        "chat_id": chat_id,
+        "messages": list(messages),
+        "has_more": has_more,
+        "visible": CHAT_VISIBLE_MESSAGES,
+        "pending": [],  # appended messages whose ids are still write-behind Futures
+        "summary": None  # rolling history summary, loaded on the first turn
+    }
+
+def settle_message_ids(window):
+    """
+    Replace the write-behind Futures of the window's new messages with the
+    ids they resolved to (None if the write failed), so session state holds
+    plain values. Writes still in flight are checked again on a later rerun.
+    """
+    pending = []
+    for msg in window["pending"]:
+        for field in ("id", "prediction_id"):
+            if isinstance(msg.get(field), Future) and msg[field].done():
+                msg[field] = settled(msg[field])
+        if isinstance(msg.get("id"), Future) or isinstance(msg.get("prediction_id"), Future):
+            pending.append(msg)
+    window["pending"] = pending
+
+def show_earlier_messages(user_data):
+    """
+    Draw CHAT_PAGE_SIZE more messages of the open chat, reading the next
+    older page from the store once the loaded ones are all visible. The
+    window stops growing at CHAT_WINDOW_MAX messages; older ones are only
+    in the export.
+    """
+    window = get_chat_window(user_data)
+    messages = window["messages"]
+    window["visible"] = min(window["visible"] + CHAT_PAGE_SIZE, CHAT_WINDOW_MAX)
+    room = CHAT_WINDOW_MAX - len(messages)
+    if window["visible"] > len(messages) and window["has_more"] and room > 0:
+        # The page ends at the oldest message with a known id; messages whose
+        # write is pending or failed cannot anchor it
+        before_id = next((mid for mid in (settled(m["id"]) for m in messages) if mid is not None), None)
+        if messages and before_id is None:
+            return
+        earlier, window["has_more"] = get_conversation_store().load_messages(
+            st.session_state.current_user_id, window["chat_id"], limit=min(CHAT_PAGE_SIZE, room), before_id=before_id
+        )
+        messages[:0] = earlier
+
+def append_chat_message(user_data, message, prediction_ref=None):
+    """
+    Add a message to the open chat and queue it, with the chat header, for
+    the conversation store. The window keeps at most CHAT_WINDOW_MAX messages.
+    """
+    chat_id = user_data["current_chat_id"]
+    window = get_chat_window(user_data)
+    store = get_conversation_store()
+    convo = user_data["conversations"].touch(chat_id, datetime.now())
+    user_data["search"] = None
+    store.save_header(st.session_state.current_user_id, chat_id, convo["title"])
+    message.setdefault("msg_key", uuid.uuid4().hex)
+    message["id"] = store.append_message(chat_id, message, prediction_ref=prediction_ref)
+    window["messages"].append(message)
+    window["pending"].append(message)
+    if len(window["messages"]) > CHAT_WINDOW_MAX:
+        del window["messages"][:len(window["messages"]) - CHAT_WINDOW_MAX]
+        window["has_more"] = True
+        window["visible"] = min(window["visible"], CHAT_WINDOW_MAX)
 
 def generate_title(message: str):
     """
@@ -305,13 +858,86 @@ def generate_title(message: str):
     title_words = [w.capitalize() for w in keywords if w not in blacklist]
     return " ".join(title_words[:3]) or "New Chat"
 
-def export_chat(convo):
+def export_chat(convo, fmt="txt"):
     """
-    Export a conversation as a plain text transcript.
+    Export a conversation as a transcript string (plain text by default; see
+    chat_export for the Markdown and JSON formats).
     """
-    return "\n".join([f"{'You' if m['role'] == 'user' else 'Bot'}: {m['content']}" for m in convo["messages"]])
+    return "".join(iter_export(convo.get("title", "Chat"), convo["messages"], fmt))
 
 # ------------------- Auth UI -------------------
+SESSION_QUERY_PARAM = "session"  # Where older versions put the token; stripped on load
+
+def request_client_info():
+    """
+    (ip_address, user_agent) of the browser connection, where Streamlit exposes them.
+    """
+    try:
+        ip_address, user_agent = st.context.ip_address, st.context.headers.get("User-Agent")
+    except Exception:
+        return None, None
+    # Anything but strings (e.g. outside a browser connection) is not recorded
+    return (
+        ip_address if isinstance(ip_address, str) else None,
+        user_agent if isinstance(user_agent, str) else None
+    )
+
+def sign_in(user):
+    """
+    Sign user (id, name) into this session and start a login session. The
+    token stays in session state: a URL would leak it through history,
+    shared links and Referer headers.
+    Returns the client's IP address, if known.
+    """
+    ip_address, user_agent = request_client_info()
+    try:
+        st.session_state.session_token = get_session_manager().create(user["id"], ip_address, user_agent)
+    except Exception as e:
+        st.error(f"Error creating session: {str(e)}")
+    st.session_state.current_user = user["name"]
+    st.session_state.current_user_id = user["id"]
+    return ip_address
+
+def sign_out():
+    """
+    Revoke the login session and reset everything tied to the user.
+    """
+    try:
+        get_session_manager().revoke(st.session_state.session_token)
+    except Exception as e:
+        st.error(f"Error ending session: {str(e)}")
+    st.session_state.session_token = None
+    st.session_state.current_user = None
+    st.session_state.current_user_id = None
+    st.session_state.greeted = False
+    st.session_state.chats = None
+    release_session_pipeline()
+    st.session_state.user_db_connected = False
+    st.session_state.user_db_connection_details = None
+    st.session_state.user_db_schema_version = None
+
+def check_session():
+    """
+    End this session's login once its token has expired or its user_sessions
+    row has been deleted (e.g. revoked by an administrator or swept after
+    expiry). Validation is cached, so this usually costs no database round
+    trip and a deletion is noticed within SESSION_REVALIDATE_INTERVAL; if the
+    app database cannot be reached the login is kept. A token in the URL is
+    never used, only removed.
+    """
+    if SESSION_QUERY_PARAM in st.query_params:
+        st.query_params.pop(SESSION_QUERY_PARAM, None)
+    token = st.session_state.session_token
+    # Sessions signed in without a token (session creation failed) are kept as they are
+    if not st.session_state.current_user_id or not token:
+        return
+    try:
+        user_id = get_session_manager().validate(token)
+    except Exception:
+        return
+    if user_id != st.session_state.current_user_id:
+        sign_out()
+
 def auth_interface():
     """
     Main authentication UI for sign in and account creation.
@@ -328,49 +954,25 @@ def auth_interface():
             if st.form_submit_button("Sign In"):
                 user = check_user(email, password)
                 if user:
-                    # Create session
-                    import secrets
-                    session_token = secrets.token_hex(32)
-                    
-                    # Get IP address (safely)
-                    ip_address = None
-                    user_agent = None
-                    
+                    ip_address = sign_in(user)
                     try:
-                        conn = get_app_db_connection()
-                        with conn.cursor() as cursor:
-                            cursor.execute(
-                                "INSERT INTO user_sessions (user_id, session_token, ip_address, user_agent, expires_at) VALUES (%s, %s, %s, %s, DATE_ADD(NOW(), INTERVAL 24 HOUR))",
-                                (user["id"], session_token, ip_address, user_agent)
-                            )
-                        conn.commit()
-                        
                         # Log successful login
                         log_security_event(user["id"], "login_success", "User logged in successfully", ip_address)
-                        
                     except Exception as e:
-                        st.error(f"Error creating session: {str(e)}")
-                    finally:
-                        if conn:
-                            conn.close()
-                    
-                    st.session_state.current_user = user["name"]
+                        st.error(f"Error logging sign-in: {str(e)}")
                     st.success(f"Signed in as {user['name']}")
                     st.rerun()
                 else:
                     # Log failed login attempt
                     try:
-                        conn = get_app_db_connection()
-                        with conn.cursor() as cursor:
-                            cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
-                            user = cursor.fetchone()
-                            if user:
-                                log_security_event(user["id"], "login_failed", "Failed login attempt", None)
+                        with get_app_db_pool().connection() as conn:
+                            with conn.cursor() as cursor:
+                                cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
+                                user = cursor.fetchone()
+                        if user:
+                            log_security_event(user["id"], "login_failed", "Failed login attempt", None)
                     except Exception as e:
                         st.error(f"Error logging failed attempt: {str(e)}")
-                    finally:
-                        if conn:
-                            conn.close()
                     st.error("Invalid credentials")
 
     with tabs[1]:
@@ -384,79 +986,125 @@ def auth_interface():
                 else:
                     # Check if email already exists
                     try:
-                        conn = get_app_db_connection()
-                        with conn.cursor() as cursor:
-                            cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
-                            exists = cursor.fetchone()
-                            if exists:
-                                st.warning("Email already exists.")
-                            else:
-                                if create_user(username, email, password):
-                                    # Get new user ID
-                                    cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
-                                    user_id = cursor.fetchone()["id"]
-                                    
-                                    # Create session
-                                    import secrets
-                                    session_token = secrets.token_hex(32)
-                                    cursor.execute(
-                                        "INSERT INTO user_sessions (user_id, session_token, ip_address, user_agent, expires_at) VALUES (%s, %s, %s, %s, DATE_ADD(NOW(), INTERVAL 24 HOUR))",
-                                        (user_id, None, None, "DATE_ADD(NOW(), INTERVAL 24 HOUR)")
-                                    )
-                                    conn.commit()
-                                    
-                                    # Log account creation
-                                    log_security_event(user_id, "account_created", "New account created", None)
-                                    
-                                    st.session_state.current_user = username
-                                    st.success("Account created and signed in.")
-                                    st.rerun()
+                        with get_app_db_pool().connection() as conn:
+                            with conn.cursor() as cursor:
+                                cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
+                                exists = cursor.fetchone()
+                        if exists:
+                            st.warning("Email already exists.")
+                        else:
+                            user_id = create_user(username, email, password)
+                            if user_id:
+                                ip_address = sign_in({"id": user_id, "name": username})
+
+                                # Log account creation
+                                log_security_event(user_id, "account_created", "New account created", ip_address)
+
+                                st.success("Account created and signed in.")
+                                st.rerun()
                     except Exception as e:
                         st.error(f"Error creating account: {str(e)}")
-                    finally:
-                        if conn:
-                            conn.close()
 
 # ------------------- Chat Logic -------------------
 def start_new_chat(first_message=None):
     """
     Start a new chat session for the user, optionally with a first message.
     Initializes a new conversation in session state.
+    The conversation is stored with its first message.
     """
-    chat_id = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Unique across users and sessions, and ordered by creation time
+    chat_id = new_ulid()
     user_data = get_user_chats()
     title = generate_title(first_message) if first_message else "New Chat"
     user_data["current_chat_id"] = chat_id
-    user_data["conversations"][chat_id] = {
-        "title": title,
-        "messages": [],
-        "created": chat_id
-    }
+    user_data["conversations"].add(chat_id, title, datetime.now())
+    user_data["window"] = new_chat_window(chat_id)
+    user_data["window"]["summary"] = {"summary": "", "upto": None}
     st.session_state.greeted = False
 
 def sidebar_conversations():
     """
-    Render the sidebar with all previous conversations for the current user.
-    Allows opening, renaming, deleting, and exporting chats.
+    Render the sidebar list of the current user's conversations, one page at
+    a time and optionally filtered by a title search.
+    The open chat can be renamed, deleted and exported; exports are only
+    produced when the download is clicked.
     """
     user_data = get_user_chats()
-    for cid, convo in list(user_data["conversations"].items()):
-        with st.sidebar.expander(convo["title"], expanded=False):
-            if st.button("🗂 Open", key=f"open_{cid}"):
-                user_data["current_chat_id"] = cid
-
-            new_title = st.text_input("Rename", convo["title"], key=f"rename_{cid}")
-            user_data["conversations"][cid]["title"] = new_title
-
-            if st.button("🗑 Delete", key=f"delete_{cid}"):
-                del user_data["conversations"][cid]
-                if cid == user_data["current_chat_id"]:
-                    start_new_chat()
-                st.rerun()
+    store = get_conversation_store()
+    user_id = st.session_state.current_user_id
+    current_id = user_data["current_chat_id"]
+
+    st.sidebar.markdown("### 💬 Conversations")
+    query = st.sidebar.text_input("Search", key="conversation_search", placeholder="Search titles").strip()
+    if query != user_data["list_query"]:
+        user_data["list_query"] = query
+        user_data["list_page"] = 0
+    page = user_data["list_page"]
+    rows, has_next = get_conversation_page(user_data, query, page)
+
+    for cid, title in rows:
+        label = f"▶ {title}" if cid == current_id else title
+        if st.sidebar.button(label, key=f"open_{cid}", use_container_width=True):
+            user_data["current_chat_id"] = cid
+            st.rerun()
+    if not rows:
+        st.sidebar.caption("No conversations found." if query else "No conversations yet.")
+
+    if page > 0 or has_next:
+        col1, col2, col3 = st.sidebar.columns([1, 2, 1])
+        if col1.button("◀", key="conversations_prev", disabled=page == 0):
+            user_data["list_page"] -= 1
+            st.rerun()
+        col2.caption(f"Page {page + 1}")
+        if col3.button("▶", key="conversations_next", disabled=not has_next):
+            user_data["list_page"] += 1
+            st.rerun()
 
-            export_data = export_chat(convo)
-            st.download_button("📁 Export Chat", export_data, f"{new_title}.txt", mime="text/plain", key=f"export_{cid}")
+    convo = user_data["conversations"].get(current_id)
+    if convo is None:
+        return
+    with st.sidebar.expander("⚙️ Current chat", expanded=False):
+        # The box follows titles set elsewhere (e.g. from the first message);
+        # only an edit by the user renames the chat
+        st.session_state[f"rename_{current_id}"] = convo["title"]
+        st.text_input("Rename", key=f"rename_{current_id}", on_change=rename_chat, args=(current_id,))
+        new_title = convo["title"]
+
+        if st.button("🗑 Delete", key=f"delete_{current_id}"):
+            store.delete(user_id, current_id)
+            user_data["conversations"].remove(current_id)
+            user_data["search"] = None
+            start_new_chat()
+            st.rerun()
 
+        fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"export_format_{current_id}")
+        mime, ext = EXPORT_FORMATS[fmt]
+        # Messages are read from the store in batches, only when the download is clicked
+        st.download_button(
+            "📁 Export Chat",
+            data=lambda: read_and_close(export_to_file(new_title, store.iter_messages(user_id, current_id), fmt)),
+            file_name=f"{new_title}{ext}",
+            mime=mime,
+            on_click="ignore",
+            key=f"export_{current_id}"
+        )
+
+def rename_chat(chat_id):
+    """
+    on_change of the Rename box: give the chat the title the user typed.
+    """
+    title = st.session_state[f"rename_{chat_id}"].strip()
+    user_data = get_user_chats()
+    convo = user_data["conversations"].get(chat_id)
+    if not title or convo is None or title == convo["title"]:
+        return
+    user_data["conversations"].rename(chat_id, title)
+    user_data["search"] = None
+    get_conversation_store().rename(st.session_state.current_user_id, chat_id, title)
+
+TELEMETRY_DROPPED_NOTICE = "The database is busy: part of this conversation could not be saved."
+
+@profiling.profiled()
 def chat_interface():
     """
     Main chat interface for the AI chatbot.
@@ -466,119 +1114,502 @@ def chat_interface():
     user_data = get_user_chats()
     st.title("🦙💬 Llama 2 Chatbot")
     st.markdown(f"### 👋 Hello, {st.session_state.current_user}!")
+    if st.session_state.pop("telemetry_notice", False):
+        st.warning(TELEMETRY_DROPPED_NOTICE)
 
     current_id = user_data["current_chat_id"]
     chat = user_data["conversations"].get(current_id)
 
     if not chat:
         return
+    window = get_chat_window(user_data)
+    messages = window["messages"]
 
-    # Build chat history for RAG pipeline
-    chat_history = [
-        (msg["role"], msg["content"]) for msg in chat["messages"]
-    ]
-
-    for msg in chat["messages"]:
-        if msg["role"] == "user":
-            st.markdown(f"<div class='message user-msg'>🧑 You: {msg['content']}</div>", unsafe_allow_html=True)
+    # Only the latest messages are drawn; older ones stay behind "load earlier"
+    hidden = max(0, len(messages) - window["visible"])
+    if hidden or window["has_more"]:
+        st.caption(f"{hidden}{'+' if window['has_more'] else ''} earlier messages hidden")
+        if hidden or len(messages) < CHAT_WINDOW_MAX:
+            if st.button("⬆️ Load earlier messages", key=f"load_earlier_{current_id}"):
+                show_earlier_messages(user_data)
+                st.rerun()
         else:
-            st.markdown(f"<div class='message bot-msg'>🤖 Bot: {msg['content']}</div>", unsafe_allow_html=True)
+            st.caption("Export the chat from the sidebar to read older messages.")
+
+    for msg in messages[hidden:]:
+        body, sources = format_message(msg)
+        st.markdown(body, unsafe_allow_html=True)
+        if msg["role"] != "user":
             # Optionally show sources if present
-            if msg.get("sources"):
+            if sources:
                 with st.expander("Show source documents"):
-                    for i, doc in enumerate(msg["sources"]):
-                        st.markdown(f"**Source {i+1}:**\n{doc.page_content[:500]}{'...' if len(doc.page_content) > 500 else ''}")
+                    for source in sources:
+                        st.markdown(source)
+
+            # Results of the generated SQL, if it was executed
+            if msg.get("sql_error"):
+                st.error(f"Query failed: {msg['sql_error']}")
+            elif msg.get("sql_result"):
+                with st.expander(f"Query result ({msg['sql_result']['row_count']} rows)"):
+                    render_sql_result(msg["sql_result"], msg["msg_key"])
             
             # Add feedback option for bot responses
+            # prediction_id may still be a pending Future from the telemetry writer
             if msg.get("prediction_id"):
+                key = msg["msg_key"]
                 with st.expander("Rate this response"):
-                    rating = st.slider("Rating", 1, 5, 3, key=f"rating_{msg['prediction_id']}")
-                    comment = st.text_area("Comment (optional)", key=f"comment_{msg['prediction_id']}")
-                    if st.button("Submit Feedback", key=f"feedback_{msg['prediction_id']}"):
-                        insert_feedback(msg["prediction_id"], rating, comment)
-                        st.success("Thank you for your feedback!")
+                    rating = st.slider("Rating", 1, 5, 3, key=f"rating_{key}")
+                    comment = st.text_area("Comment (optional)", key=f"comment_{key}")
+                    if st.button("Submit Feedback", key=f"feedback_{key}"):
+                        try:
+                            insert_feedback(resolve(msg["prediction_id"], timeout=10), rating, comment)
+                            st.success("Thank you for your feedback!")
+                        except Exception as e:
+                            st.error(f"Error saving feedback: {str(e)}")
 
     user_input = st.chat_input("Type your message here...")
     if user_input:
-        if not chat["messages"]:
+        # A new message supersedes any answer still being generated
+        if st.session_state.agent_run is not None:
+            st.session_state.agent_run.cancel()
+            st.session_state.agent_run = None
+
+        if not messages:
             chat["title"] = generate_title(user_input)
 
-        # Get user ID from session (use app DB, not user DB)
-        conn = get_app_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id FROM users WHERE name=%s", (st.session_state.current_user,))
-            user_id = cursor.fetchone()["id"]
-        conn.close()
+        # Chat history for the RAG pipeline (recent turns plus a rolling summary) is
+        # built on the agent thread, since folding old turns may call the LLM
+        history_job = prepare_chat_history(window)
 
-        # Store user input in database
-        input_id = insert_input(user_id, "text", input_txt=user_input)
+        timer = TurnTimer()
+        user_id = st.session_state.current_user_id
 
-        chat["messages"].append({"role": "user", "content": user_input})
+        # Queue user input for the database (written in the background)
+        writer = get_telemetry_writer()
+        with timer.stage("input_enqueue"):
+            input_id = writer.submit_input(user_id, "text", input_txt=user_input)
 
-        # Call the RAG pipeline
-        with st.spinner("Bot is thinking..."):
-            result, sources = run_agent(user_input, chat_history)
-            
-            # Store prediction in database
-            prediction_id = insert_prediction(input_id, result)
-            
-            # Store execution result
-            import json
-            from datetime import datetime
-            execution_time = datetime.now().time()
-            insert_execution_result(
-                prediction_id=prediction_id,
-                result_json=json.dumps({"result": result}),
-                execution_time=execution_time,
-                success=True
+        user_msg = {"role": "user", "content": user_input}
+        append_chat_message(user_data, user_msg)
+        st.markdown(format_message(user_msg)[0], unsafe_allow_html=True)
+
+        # Repeated questions against the same database and documents are served from cache.
+        # Only the first question of a chat is cacheable: follow-ups ("and last year?")
+        # depend on the conversation, which is not part of the cache key.
+        answer_cache = get_answer_cache()
+        cacheable = history_job["empty"]
+        cached = None
+        with timer.stage("cache_lookup"):
+            if cacheable:
+                cache_scope = get_answer_cache_scope()
+                cached = answer_cache.get(user_input, cache_scope)
+        result, sources, generated_sql = None, None, None
+        if cached is not None:
+            result, sources, generated_sql = cached["result"], cached["sources"], cached["generated_sql"]
+        else:
+            # Call the RAG pipeline off the script thread and stream its answer
+            agent_fn, stream_fn = get_session_agent()
+            run = AgentRun(
+                get_agent_executor(),
+                profiling.bind(with_chat_history(agent_fn, history_job), "run_agent"),
+                user_input,
+                None,
+                stream_fn=profiling.bind(with_chat_history(stream_fn, history_job), "run_agent")
             )
+            st.session_state.agent_run = run
+            st.write_stream(run.tokens())
+            agent_error = None
+            try:
+                result, sources = run.result()
+            except AgentCancelled:
+                return
+            except Exception as e:
+                agent_error = f"{type(e).__name__}: {e}"
+                st.error(f"Error generating a response: {str(e)}")
+            finally:
+                st.session_state.agent_run = None
+            save_chat_history(window, history_job)
+            record_agent_timings(timer, run, agent_error)
+            if run.started_at is not None and run.finished_at is not None:
+                AGENT_SECONDS.observe(run.finished_at - run.started_at)
+            if agent_error is None:
+                generated_sql = result
+            if agent_error is None and cacheable:
+                answer_cache.put(user_input, cache_scope, {"result": result, "sources": sources, "generated_sql": generated_sql})
 
-        chat["messages"].append({
-            "role": "bot", 
-            "content": result, 
-            "sources": sources if sources else None,
-            "prediction_id": prediction_id
-        })
-        st.rerun()
+        # Run the generated SQL read-only; large results are kept on disk
+        sql_result, sql_error, stored_result = None, None, None
+        if result is not None:
+            start = time.perf_counter()
+            sql_result, sql_error = execute_generated_sql(generated_sql)
+            timer.record("sql_execution", time.perf_counter() - start, error=sql_error)
+            with timer.stage("result_store"):
+                stored_result = message_sql_result(sql_result)
+
+        # Queue prediction and execution result; ids resolve once written.
+        # Only the enqueueing is timed here, the writes happen in the background
+        turn_refs = [input_id, user_msg["id"]]
+        with timer.stage("telemetry_enqueue"):
+            prediction_id = writer.submit_prediction(input_id, generated_sql)
+            turn_refs.append(prediction_id)
+            if result is not None:
+                bot_msg = {
+                    "role": "bot",
+                    "content": result,
+                    "sources": serialize_sources(sources),
+                    "prediction_id": prediction_id,
+                    "sql_result": stored_result,
+                    "sql_error": sql_error
+                }
+                append_chat_message(user_data, bot_msg, prediction_ref=prediction_id)
+                turn_refs.append(bot_msg["id"])
+        execution_id = writer.submit_execution_result(
+            prediction_id,
+            result_json=json.dumps({
+                "result": result,
+                "cached": cached is not None,
+                "sql_result": sql_result,
+                "timings": timer.as_dict()
+            }, default=str),
+            execution_time=timer.execution_time,
+            success=timer.success,
+            error_message=timer.error_message
+        )
+        TURN_SECONDS.observe(timer.total_seconds)
+        profiling.annotate(turn=timer.as_dict())
+        # A full telemetry queue drops the turn's records instead of failing the turn
+        if any(map(dropped, turn_refs + [execution_id])):
+            if result is None:
+                st.warning(TELEMETRY_DROPPED_NOTICE)
+            else:
+                st.session_state.telemetry_notice = True
+        if result is not None:
+            st.rerun()
+
+@st.cache_resource
+def get_history_manager():
+    """
+    History sizing is set with CHAT_HISTORY_TURNS, CHAT_HISTORY_TOKEN_BUDGET
+    and CHAT_SUMMARY_TOKENS. Uses rag_pipeline.summarize if the pipeline has one.
+    """
+    return HistoryManager(
+        max_turns=int(os.getenv("CHAT_HISTORY_TURNS", "6")),
+        token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000")),
+        summary_tokens=int(os.getenv("CHAT_SUMMARY_TOKENS", "400")),
+        summarize=getattr(rag_pipeline, "summarize", None)
+    )
+
+def prepare_chat_history(window):
+    """
+    Snapshot of the open chat window that with_chat_history builds the agent's
+    chat_history from. The rolling summary is read from the store once per
+    window; "empty" says whether the turn has no history at all.
+    """
+    if window["summary"] is None:
+        window["summary"] = get_conversation_store().load_summary(st.session_state.current_user_id, window["chat_id"])
+    return {
+        "manager": get_history_manager(),
+        "messages": list(window["messages"]),
+        "summary": dict(window["summary"]),
+        "empty": not window["messages"] and not window["summary"]["summary"],
+        "changed": False,
+    }
+
+def with_chat_history(func, job):
+    """
+    Wrap an agent function so it builds its chat_history from job on the
+    thread it runs on, keeping summarization off the script thread. Messages
+    whose write has not finished, or failed, count as having no id.
+    """
+    if func is None:
+        return None
+
+    @functools.wraps(func)
+    def wrapper(user_input, _chat_history, *args, **kwargs):
+        history, job["changed"] = job["manager"].build(
+            job["messages"],
+            job["summary"],
+            message_id=lambda msg: settled(msg.get("id"))
+        )
+        return func(user_input, history, *args, **kwargs)
+    return wrapper
+
+def save_chat_history(window, job):
+    """
+    Keep and save the rolling summary if the agent run updated it.
+    """
+    if not job["changed"]:
+        return
+    window["summary"] = job["summary"]
+    get_conversation_store().save_summary(window["chat_id"], job["summary"]["summary"], job["summary"]["upto"])
+
+def format_message(msg):
+    """
+    Formatted HTML of a message and its source snippets.
+    """
+    if msg["role"] == "user":
+        body = f"<div class='message user-msg'>🧑 You: {msg['content']}</div>"
+    else:
+        body = f"<div class='message bot-msg'>🤖 Bot: {msg['content']}</div>"
+    sources = [
+        f"**Source {i+1}:**\n{doc['page_content'][:500]}{'...' if len(doc['page_content']) > 500 else ''}"
+        for i, doc in enumerate(msg.get("sources") or [])
+    ]
+    return body, sources
+
+def record_agent_timings(timer, run, error=None):
+    """
+    Split an agent run into retrieval (start to first streamed token) and
+    llm_generation (first token to finish). Non-streaming agents report their
+    whole run as llm_generation, since retrieval happens inside run_agent.
+    """
+    if run.started_at is None or run.finished_at is None:
+        timer.record("llm_generation", 0.0, error=error or "Agent run did not start")
+        return
+    if run.first_token_at is not None:
+        timer.record("retrieval", run.first_token_at - run.started_at)
+        timer.record("llm_generation", run.finished_at - run.first_token_at, error=error)
+    else:
+        timer.record("llm_generation", run.finished_at - run.started_at, error=error)
+
+# ------------------- SQL Results -------------------
+RESULTS_DIR = os.getenv("RESULTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".results"))
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "500"))
+
+def execute_generated_sql(answer):
+    """
+    Execute the SQL contained in an agent answer on the connected database.
+    Small results are returned inline; larger ones are written to a Parquet
+    file under RESULTS_DIR and only referenced.
+    Returns (sql_result, error_message); both are None if there was no SQL.
+    """
+    sql = extract_sql(answer)
+    executor = get_user_db_executor()
+    if not sql or executor is None:
+        return None, None
+    try:
+        result = store_rows(
+            executor.iter_rows(sql),
+            RESULTS_DIR,
+            inline_rows=int(os.getenv("RESULT_INLINE_ROWS", "1000"))
+        )
+    except Exception as e:
+        return None, str(e)
+    if "result_ref" in result:
+        prune_stored_results(keep=(result["result_ref"],))
+    return result, None
+
+def prune_stored_results(keep=()):
+    """
+    Delete stored results past RESULTS_MAX_AGE_HOURS, and the oldest ones
+    while RESULTS_DIR is over RESULTS_MAX_MB. Called after every store; runs
+    at most once every RESULTS_PRUNE_INTERVAL seconds.
+    """
+    prune_results(
+        RESULTS_DIR,
+        max_age=float(os.getenv("RESULTS_MAX_AGE_HOURS", "24")) * 3600,
+        max_bytes=int(os.getenv("RESULTS_MAX_MB", "2048")) * 1024 * 1024,
+        keep=keep,
+        min_interval=float(os.getenv("RESULTS_PRUNE_INTERVAL", "60"))
+    )
+
+def message_sql_result(sql_result):
+    """
+    What a chat message keeps of a query result: columns, row count and the
+    Parquet reference, never the rows. Inline results are written under
+    RESULTS_DIR too, so messages stay small in session state and in
+    conversation_messages.meta.
+    """
+    if not sql_result or "rows" not in sql_result:
+        return sql_result
+    if not sql_result["rows"]:
+        return {"columns": sql_result["columns"], "row_count": 0}
+    try:
+        stored = store_rows(sql_result["rows"], RESULTS_DIR, inline_rows=0)
+    except Exception:
+        return {"columns": sql_result["columns"], "row_count": sql_result["row_count"]}
+    prune_stored_results(keep=(stored["result_ref"],))
+    return stored
+
+def render_sql_result(sql_result, key):
+    """
+    Show a query result. Stored results are read one page at a time and can be
+    exported; the export file is only produced when its button is clicked.
+    """
+    if "rows" in sql_result:
+        # Messages saved before results were always stored by reference
+        st.dataframe(sql_result["rows"], use_container_width=True)
+        return
+    if "result_ref" not in sql_result:
+        st.caption("No rows." if not sql_result["row_count"] else "This result was not stored.")
+        return
+
+    ref = sql_result["result_ref"]
+    if not os.path.exists(ref):
+        st.warning("This result is no longer available.")
+        return
+    pages = max(1, -(-sql_result["row_count"] // RESULT_PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"result_page_{key}")
+    st.dataframe(read_page(ref, page - 1, RESULT_PAGE_SIZE), use_container_width=True, height=400)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("⬇️ CSV", data=lambda: read_and_close(export_csv(ref)), file_name="result.csv", mime="text/csv", on_click="ignore", key=f"result_csv_{key}")
+    with col2:
+        st.download_button("⬇️ Parquet", data=lambda: read_and_close(open(ref, "rb")), file_name="result.parquet", mime="application/octet-stream", on_click="ignore", key=f"result_parquet_{key}")
+
+def read_and_close(f):
+    """
+    Contents of a binary file object, closing it afterwards.
+    """
+    with f:
+        return f.read()
+
+@st.cache_resource
+def get_agent_executor():
+    """
+    Process-wide worker threads for agent runs (AGENT_MAX_CONCURRENCY caps
+    how many answers are generated at once).
+    """
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("AGENT_MAX_CONCURRENCY", "8")),
+        thread_name_prefix="agent"
+    )
+
+@st.cache_resource
+def get_answer_cache():
+    """
+    Process-wide cache of agent answers (ANSWER_CACHE_* env vars tune it).
+    """
+    return AnswerCache(
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+        ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+        # 0 (the default) matches exact normalized questions only
+        similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0")) or None
+    )
+
+def get_answer_cache_scope():
+    """
+    Everything a cached answer depends on besides the question: the connected
+    database, its schema version and the document corpus version.
+    """
+    details = st.session_state.user_db_connection_details or {}
+    indexer = get_rag_indexer()
+    # Without an index manifest, new content-addressed uploads still change the docs dir mtime
+    corpus_version = indexer.version if indexer is not None else (os.stat(DOCS_DIR).st_mtime_ns if os.path.isdir(DOCS_DIR) else 0)
+    return (
+        details.get("host"),
+        str(details.get("port")),
+        details.get("database"),
+        st.session_state.user_db_schema_version,
+        corpus_version
+    )
 
 # ------------------- Document Processing -------------------
+DOCS_DIR = os.getenv("DOCS_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src/_1_Inference/docs'))
+
+@st.cache_resource
+def get_pdf_extractor():
+    """
+    Process-wide PDF extraction pool.
+    Worker count, page-range size and per-worker memory cap are set with the
+    PDF_MAX_WORKERS, PDF_PAGES_PER_TASK and PDF_WORKER_MAX_MEMORY_MB env vars.
+    """
+    return PdfExtractor(
+        max_workers=int(os.getenv("PDF_MAX_WORKERS", "0")) or None,
+        pages_per_task=int(os.getenv("PDF_PAGES_PER_TASK", "8")),
+        max_memory_mb=int(os.getenv("PDF_WORKER_MAX_MEMORY_MB", "1024"))
+    )
+
+@st.cache_resource
+def get_rag_indexer():
+    """
+    Incremental indexer over the RAG pipeline's vector store.
+    Returns None if the pipeline does not expose a vector store, in which case
+    uploads fall back to rag_pipeline.reload_documents().
+    """
+    store = getattr(rag_pipeline, "vectorstore", None)
+    if store is None:
+        return None
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    return IncrementalIndexer(
+        store,
+        os.path.join(DOCS_DIR, ".rag_index.json"),
+        splitter=getattr(rag_pipeline, "text_splitter", None)
+    )
+
+@profiling.profiled()
 def process_uploaded_document(uploaded_file, user_id):
     """
     Process an uploaded document file, store it and extract content.
+    Files are stored by content hash; content that was already stored and
+    indexed is only recorded for this user, not extracted again.
+    PDF pages are added to the RAG index incrementally as they are extracted;
+    other file types still trigger a full reload of the docs directory.
     """
-    # Store file in filesystem
-    docs_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src/_1_Inference/docs'))
-    os.makedirs(docs_dir, exist_ok=True)
-    file_path = os.path.join(docs_dir, uploaded_file.name)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # Store file in filesystem, keyed by content (the inputs row keeps the name)
+    sha256, file_path, is_new = store_upload(uploaded_file, DOCS_DIR, uploaded_file.name)
 
-    # Store file metadata in database
-    input_id = insert_input(user_id, "file", file_path=file_path)
-    
-    # Store document content in database
+    indexer = get_rag_indexer()
+    if not is_new and (indexer is None or uploaded_file.type != "application/pdf" or indexer.is_indexed(file_path, sha256)):
+        get_telemetry_writer().submit_input(user_id, "file", input_txt=uploaded_file.name, file_path=file_path)
+        st.sidebar.success(f"{uploaded_file.name} is already in the document store.")
+        return
+
+    index_session = None
+    indexed = False
+
+    # Store file metadata and document content in database (one transaction)
     try:
         # Read file content based on type
         if uploaded_file.type == "application/pdf":
-            reader = PdfReader(uploaded_file)
-            for page_num in range(len(reader.pages)):
-                content = reader.pages[page_num].extract_text()
-                insert_document(input_id, content=content, page_number=page_num + 1)
+            # Pages stream from the worker pool straight into the bulk insert
+            progress = st.sidebar.progress(0.0, text=f"Extracting {uploaded_file.name}...")
+            pages = get_pdf_extractor().extract(
+                file_path,
+                on_progress=lambda done, total: progress.progress(done / total, text=f"Extracted {done}/{total} pages")
+            )
+            if indexer is not None:
+                # ...and into the RAG index; None means identical content is already indexed
+                index_session = indexer.begin(file_path, sha256)
+                indexed = True
+                if index_session is not None:
+                    pages = _index_pages(pages, index_session)
         elif uploaded_file.type in ["image/jpeg", "image/png"]:
             # For images, store the file path
-            insert_document(input_id, content=f"Image file: {file_path}")
+            pages = [(None, f"Image file: {file_path}")]
         else:
             # For other files, store the file path
-            insert_document(input_id, content=f"Document file: {file_path}")
+            pages = [(None, f"Document file: {file_path}")]
+        with index_session or contextlib.nullcontext():
+            input_id, page_count, elapsed = ingest_document(user_id, file_path, pages, input_txt=uploaded_file.name)
+        if uploaded_file.type == "application/pdf":
+            PDF_PAGES.inc(page_count)
+            PDF_PAGES_PER_SECOND.observe(page_count / max(elapsed, 1e-6))
+        if page_count > 1:
+            st.sidebar.info(f"Stored {page_count} pages in {elapsed:.2f}s ({page_count / max(elapsed, 1e-6):.0f} pages/sec)")
     except Exception as e:
+        indexed = False
         st.sidebar.error(f"Error processing file: {str(e)}")
-        # Still store the file path even if content extraction fails
-        insert_document(input_id, content=f"File: {file_path}")
+        # Nothing from the failed attempt was kept; still store the file path
+        ingest_document(user_id, file_path, [(None, f"File: {file_path}")], input_txt=uploaded_file.name)
+
+    if indexed:
+        st.sidebar.success(f"Uploaded {uploaded_file.name}. RAG document store updated!")
+        return
 
     st.sidebar.success(f"Uploaded {uploaded_file.name}. Reloading RAG documents...")
-    rag_pipeline.reload_documents(docs_dir)
+    with RAG_RELOAD_SECONDS.time():
+        rag_pipeline.reload_documents(DOCS_DIR)
     st.sidebar.success("RAG document store updated!")
 
+def _index_pages(pages, index_session):
+    """
+    Pass pages through unchanged while adding each one to the RAG index.
+    """
+    for page_number, text in pages:
+        index_session.add_page(page_number, text)
+        yield page_number, text
+
 # ------------------- Main App -------------------
 def main():
     """
@@ -589,18 +1620,29 @@ def main():
     
     # Initialize session state
     initialize_session_state()
+    start_metrics_exporters()
+    get_session_tracker().touch(st.session_state.session_key)
+    check_session()
 
-    if not st.session_state.current_user:
+    if not st.session_state.current_user or not st.session_state.current_user_id:
         auth_interface()
         return
 
+    # Pick up account changes (e.g. a rename) from the process-wide user cache;
+    # while the app database is unreachable the known name is kept
+    try:
+        user = get_user_cache().get(st.session_state.current_user_id)
+    except Exception:
+        user = {"name": st.session_state.current_user}
+    if user is None:
+        sign_out()
+        st.rerun()
+    st.session_state.current_user = user["name"]
+
     # Sidebar
     st.sidebar.markdown(f"👤 **User:** {st.session_state.current_user}")
     if st.sidebar.button("🚪 Sign Out"):
-        st.session_state.current_user = None
-        st.session_state.greeted = False
-        st.session_state.user_db_connected = False
-        st.session_state.user_db_connection_details = None
+        sign_out()
         st.rerun()
 
     # User Database Connection
@@ -611,15 +1653,10 @@ def main():
     # Document upload
     st.sidebar.markdown("### 📄 Upload Document for RAG")
     uploaded_file = st.sidebar.file_uploader("Upload a document (PDF, DOCX, PNG, JPG)", type=["pdf", "docx", "doc", "png", "jpg", "jpeg"])
-    if uploaded_file is not None:
-        # Get user ID from session (use app DB, not user DB)
-        conn = get_app_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id FROM users WHERE name=%s", (st.session_state.current_user,))
-            user_id = cursor.fetchone()["id"]
-        conn.close()
-        
-        process_uploaded_document(uploaded_file, user_id)
+    # The uploader returns the same file on every rerun; process each upload once
+    if uploaded_file is not None and uploaded_file.file_id != st.session_state.last_upload_id:
+        process_uploaded_document(uploaded_file, st.session_state.current_user_id)
+        st.session_state.last_upload_id = uploaded_file.file_id
 
     if st.sidebar.button("➕ New Chat"):
         start_new_chat()
@@ -627,19 +1664,39 @@ def main():
 
     if st.sidebar.button("🧹 Clear History"):
         user_data = get_user_chats()
-        user_data["conversations"] = {}
+        get_conversation_store().delete_all(st.session_state.current_user_id)
+        user_data["conversations"].clear()
+        user_data["headers_cursor"] = None
+        user_data["more_headers"] = False
+        user_data["search"] = None
         start_new_chat()
         st.session_state.greeted = False
 
     # Ensure user has a chat session
     user_data = get_user_chats()
-    if not user_data["conversations"]:
-        start_new_chat()
-    elif not user_data["current_chat_id"]:
-        user_data["current_chat_id"] = list(user_data["conversations"].keys())[0]
+    if not user_data["current_chat_id"] or user_data["current_chat_id"] not in user_data["conversations"]:
+        # Reopen the most recently updated conversation, or start one
+        user_data["current_chat_id"] = user_data["conversations"].first()
+        if user_data["current_chat_id"] is None:
+            start_new_chat()
 
     sidebar_conversations()
     chat_interface()
 
+def run_app():
+    """
+    Run main(), under the profiler when profiling is enabled for this session.
+    """
+    if not profiling_enabled():
+        main()
+        return
+    with get_profiler().capture("rerun") as capture:
+        try:
+            main()
+        finally:
+            capture.context["session_key"] = st.session_state.get("session_key")
+            capture.context["user_id"] = st.session_state.get("current_user_id")
+            capture.context["chat_id"] = (st.session_state.get("chats") or {}).get("current_chat_id")
+
 if __name__ == "__main__":
-    main()
+    run_app()
@@ -0,0 +1,103 @@
+import re
+import time
+import queue
+import threading
+
+# ------------------- Streaming Agent Runs -------------------
+# run_agent is executed on a worker thread so the Streamlit script thread is
+# only busy rendering. Tokens are handed over through a queue and can be fed
+# straight into st.write_stream. A run can be cancelled at any time: the
+# stream stops immediately and a streaming agent is interrupted at its next
+# token; a non-streaming agent's late answer is simply dropped.
+
+_DONE = object()
+
+
+class AgentCancelled(Exception):
+    """Raised inside the agent callback once the run has been cancelled."""
+
+
+class AgentRun:
+    """
+    One run of the agent on a worker thread.
+    If stream_fn is given it is called as stream_fn(user_input, chat_history,
+    on_token) and must return (result, sources), calling on_token(text) for
+    each generated token. Otherwise agent_fn(user_input, chat_history) is
+    called and its final answer is streamed word by word.
+    """
+
+    def __init__(self, executor, agent_fn, user_input, chat_history, stream_fn=None):
+        self._agent_fn = agent_fn
+        self._stream_fn = stream_fn
+        self._tokens = queue.Queue()
+        self._cancelled = threading.Event()
+        self._streamed = False
+        # perf_counter timestamps: worker start, first streamed token, finish
+        self.started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+        self.future = executor.submit(self._run, user_input, chat_history)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Stop streaming and discard the answer.
+        """
+        self._cancelled.set()
+        self.future.cancel()
+        self._tokens.put(_DONE)
+
+    def _on_token(self, token):
+        if self._cancelled.is_set():
+            raise AgentCancelled()
+        if not self._streamed:
+            self.first_token_at = time.perf_counter()
+            self._streamed = True
+        self._tokens.put(token)
+
+    def _run(self, user_input, chat_history):
+        self.started_at = time.perf_counter()
+        try:
+            if self._stream_fn is not None:
+                return self._stream_fn(user_input, chat_history, self._on_token)
+            return self._agent_fn(user_input, chat_history)
+        finally:
+            self.finished_at = time.perf_counter()
+            self._tokens.put(_DONE)
+
+    def tokens(self):
+        """
+        Generator of answer tokens for st.write_stream.
+        Closing it early (e.g. the script run is stopped because the user sent
+        another message or left the page) cancels the run.
+        """
+        finished = False
+        try:
+            while True:
+                token = self._tokens.get()
+                if token is _DONE:
+                    break
+                yield token
+            if self._cancelled.is_set() or self.future.cancelled() or self.future.exception() is not None:
+                finished = True
+                return
+            if not self._streamed:
+                # Non-streaming agent: replay the final answer in small pieces
+                result, _ = self.future.result()
+                yield from re.findall(r"\S+\s*|\s+", str(result))
+            finished = True
+        finally:
+            if not finished:
+                self.cancel()
+
+    def result(self, timeout=None):
+        """
+        (result, sources) of the run. Raises AgentCancelled if it was cancelled
+        and re-raises any error from the agent.
+        """
+        if self._cancelled.is_set() or self.future.cancelled():
+            raise AgentCancelled()
+        return self.future.result(timeout=timeout)
@@ -0,0 +1,145 @@
+import re
+import math
+import time
+import threading
+from collections import Counter, OrderedDict
+
+# ------------------- Answer Cache -------------------
+# Caches agent answers per (connected database, schema version, document
+# corpus version). Lookups match the normalized question text exactly; an
+# optional similarity tier also accepts the most similar cached question in
+# the same scope.
+
+
+def normalize_question(text):
+    """
+    Lowercase, drop punctuation and collapse whitespace.
+    """
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a, b):
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    if not dot:
+        return 0.0
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm
+
+
+class _Entry:
+    __slots__ = ("scope", "question", "numbers", "vector", "value", "expires_at")
+
+    def __init__(self, scope, question, value, expires_at):
+        self.scope = scope
+        self.question = question
+        self.numbers = re.findall(r"\d+", question)
+        self.vector = _trigrams(question)
+        self.value = value
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """
+    Thread-safe TTL + LRU cache of agent answers.
+    scope identifies everything the answer depends on besides the question,
+    e.g. (host, port, database, schema_version, corpus_version).
+    If similarity_threshold is set, near-duplicate phrasings also match when
+    their character-trigram cosine similarity is at least the threshold and
+    they mention the same numbers ("top 10" never matches "top 5"). Trigrams
+    cannot tell "highest" from "lowest", so this is off by default.
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600, similarity_threshold=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # (scope, question) -> _Entry, oldest first
+        self._by_scope = {}  # scope -> set of keys, for the similarity tier
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, question, scope):
+        """
+        Return the cached value for question in scope, or None.
+        """
+        question = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            key = (scope, question)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.value
+
+            if not self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            best, best_score = None, self.similarity_threshold
+            probe = _Entry(scope, question, None, 0)
+            for candidate_key in list(self._by_scope.get(scope, ())):
+                candidate = self._entries[candidate_key]
+                if candidate.expires_at <= now:
+                    self._remove(candidate_key)
+                    continue
+                if candidate.numbers != probe.numbers:
+                    continue
+                score = _cosine(probe.vector, candidate.vector)
+                if score >= best_score:
+                    best, best_score = candidate_key, score
+            if best is not None:
+                self._entries.move_to_end(best)
+                self.similar_hits += 1
+                return self._entries[best].value
+
+            self.misses += 1
+            return None
+
+    def put(self, question, scope, value):
+        """
+        Cache value for question in scope.
+        """
+        question = normalize_question(question)
+        key = (scope, question)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(scope, question, value, time.monotonic() + self.ttl)
+            self._by_scope.setdefault(scope, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        keys = self._by_scope.get(entry.scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_scope[entry.scope]
+
+    def stats(self):
+        """
+        Hit/miss counters and current size.
+        """
+        with self._lock:
+            lookups = self.exact_hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,161 @@
+"""
+Per-function benchmarks (pytest-benchmark) with memory tracking.
+
+Timings come from pytest-benchmark; each benchmark also runs its function
+once under tracemalloc and stores peak and net allocation in extra_info.
+The app database is the SQLite stand-in from sqlite_db.py.
+
+    pytest benchmarks/bench_functions.py --benchmark-storage=benchmarks/baselines/functions --benchmark-autosave
+    python benchmarks/report.py            # latest saved run vs. the one before
+"""
+import os
+import sys
+import json
+import tracemalloc
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import setup_environment, seed_user  # noqa: E402
+
+setup_environment()
+
+import Web_UI  # noqa: E402
+from chat_history import HistoryManager  # noqa: E402
+from synthetic import pdf_upload  # noqa: E402
+
+QUESTION = "Which customers placed more than three orders in March, and what was their total revenue?"
+
+
+def track_memory(benchmark, fn, *args, **kwargs):
+    """
+    Run fn once under tracemalloc and record its peak and net allocation.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    benchmark.extra_info["peak_bytes"] = peak
+    benchmark.extra_info["net_bytes"] = sum(stat.size_diff for stat in diff)
+    benchmark.extra_info["net_blocks"] = sum(stat.count_diff for stat in diff)
+
+
+def make_messages(count):
+    messages = []
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "bot"
+        content = QUESTION if role == "user" else f"```sql\nSELECT customer_id, SUM(total) FROM orders WHERE id > {i} GROUP BY customer_id;\n```"
+        messages.append({"id": i + 1, "msg_key": str(i + 1), "role": role, "content": content})
+    return messages
+
+
+@pytest.fixture(scope="module")
+def user_id():
+    return seed_user(f"bench_functions_{os.getpid()}")
+
+
+# ---- utilities ----
+
+def test_generate_title(benchmark):
+    track_memory(benchmark, Web_UI.generate_title, QUESTION)
+    assert benchmark(Web_UI.generate_title, QUESTION)
+
+
+@pytest.mark.parametrize("fmt", ["txt", "md", "json"])
+@pytest.mark.parametrize("count", [10, 100, 1000])
+def test_export_chat(benchmark, count, fmt):
+    convo = {"title": "Orders", "messages": make_messages(count)}
+    track_memory(benchmark, Web_UI.export_chat, convo, fmt)
+    assert benchmark(Web_UI.export_chat, convo, fmt)
+
+
+@pytest.mark.parametrize("count", [20, 200])
+def test_chat_history_first_build(benchmark, count):
+    """
+    Building history for a chat whose older turns are not summarized yet.
+    """
+    manager = HistoryManager()
+    messages = make_messages(count)
+
+    def build():
+        return manager.build(messages, {"summary": "", "upto": None}, lambda m: m["id"])
+
+    track_memory(benchmark, build)
+    assert benchmark(build)
+
+
+@pytest.mark.parametrize("count", [20, 200])
+def test_chat_history_next_turn(benchmark, count):
+    """
+    Building history when the rolling summary is already up to date.
+    """
+    manager = HistoryManager()
+    messages = make_messages(count)
+    state = {"summary": "", "upto": None}
+    manager.build(messages, state, lambda m: m["id"])
+
+    def build():
+        return manager.build(messages, dict(state), lambda m: m["id"])
+
+    track_memory(benchmark, build)
+    assert benchmark(build)
+
+
+# ---- document ingestion ----
+
+@pytest.mark.parametrize("pages", [10, 100, 1000])
+def test_process_uploaded_document(benchmark, user_id, pages):
+    # Every round gets new content, so nothing is skipped as already stored
+    track_memory(benchmark, Web_UI.process_uploaded_document, pdf_upload(pages), user_id)
+    benchmark.pedantic(
+        Web_UI.process_uploaded_document,
+        setup=lambda: ((pdf_upload(pages), user_id), {}),
+        rounds=3 if pages >= 1000 else 5,
+        iterations=1
+    )
+    benchmark.extra_info["pages"] = pages
+
+
+# ---- insert_* helpers ----
+
+@pytest.fixture(scope="module")
+def prediction_id(user_id):
+    input_id = Web_UI.insert_input(user_id, "text", input_txt=QUESTION)
+    return Web_UI.insert_prediction(input_id, "SELECT 1")
+
+
+def test_insert_input(benchmark, user_id):
+    track_memory(benchmark, Web_UI.insert_input, user_id, "text", QUESTION)
+    assert benchmark(Web_UI.insert_input, user_id, "text", QUESTION)
+
+
+def test_insert_document(benchmark, user_id):
+    input_id = Web_UI.insert_input(user_id, "file", input_txt="bench.pdf")
+    track_memory(benchmark, Web_UI.insert_document, input_id, "page text " * 200, 1)
+    benchmark(Web_UI.insert_document, input_id, "page text " * 200, 1)
+
+
+def test_insert_prediction(benchmark, user_id):
+    input_id = Web_UI.insert_input(user_id, "text", input_txt=QUESTION)
+    track_memory(benchmark, Web_UI.insert_prediction, input_id, "SELECT 1")
+    assert benchmark(Web_UI.insert_prediction, input_id, "SELECT 1")
+
+
+def test_insert_execution_result(benchmark, prediction_id):
+    args = (prediction_id, json.dumps({"result": "You said: hi"}), timedelta(milliseconds=120), True)
+    track_memory(benchmark, Web_UI.insert_execution_result, *args)
+    benchmark(Web_UI.insert_execution_result, *args)
+
+
+def test_insert_feedback(benchmark, prediction_id):
+    track_memory(benchmark, Web_UI.insert_feedback, prediction_id, 4, "Helpful")
+    benchmark(Web_UI.insert_feedback, prediction_id, 4, "Helpful")
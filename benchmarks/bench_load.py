@@ -0,0 +1,186 @@
+"""
+Load test: simulated users chatting and uploading through the real app script.
+
+Each simulated user is a headless Streamlit session (streamlit.testing AppTest)
+running Web_UI.py against the SQLite stand-in for ml_proj_db and the stub RAG
+pipeline. Reports p50/p95/p99 turn latency, database round trips per turn and
+throughput for each concurrency level.
+
+    python benchmarks/bench_load.py --users 1,4,16 --turns 10
+    python benchmarks/bench_load.py --save-baseline
+    python benchmarks/bench_load.py --compare --tolerance 0.2
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import (  # noqa: E402
+    WEB_UI, setup_environment, seed_user, latency_summary,
+    save_baseline, load_baseline, compare, print_comparison
+)
+
+BASELINE = "load"
+UPLOAD_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "upload_app.py")
+WRITER_THREAD = "telemetry-writer"
+
+
+def _session(user_id, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(WEB_UI, default_timeout=timeout)
+    at.session_state["current_user"] = f"bench{user_id}"
+    at.session_state["current_user_id"] = user_id
+    at.session_state["user_db_connected"] = True
+    at.session_state["user_db_connection_details"] = {
+        "host": "bench", "port": 3306, "username": "bench", "password": "bench", "database": "bench"
+    }
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"App failed to start: {at.exception[0].message}")
+    return at
+
+
+def simulate_user(user_id, turns, latencies, errors, timeout):
+    """
+    One session sending `turns` chat messages; appends per-turn latencies.
+    """
+    try:
+        at = _session(user_id, timeout)
+        for i in range(turns):
+            # Distinct numbers keep every question out of the answer cache
+            question = f"How many orders did customer {user_id} place in week {i}?"
+            start = time.perf_counter()
+            at.chat_input[0].set_value(question).run()
+            latencies.append(time.perf_counter() - start)
+            if at.exception:
+                errors.append(at.exception[0].message)
+                return
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+
+
+def run_level(users, turns, timeout):
+    from sqlite_db import ROUND_TRIPS
+
+    user_ids = [seed_user(f"load{users}_{i}_{time.time_ns()}") for i in range(users)]
+    latencies, errors = [], []
+    before_total = ROUND_TRIPS.total()
+    before_sync = ROUND_TRIPS.total(exclude_prefix=WRITER_THREAD)
+    threads = [
+        threading.Thread(target=simulate_user, args=(uid, turns, latencies, errors, timeout))
+        for uid in user_ids
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    # Let the write-behind queue drain before counting its round trips
+    time.sleep(0.5)
+    done = len(latencies) or 1
+    return {
+        "users": users,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "latency_s": latency_summary(latencies),
+        "turns_per_sec": len(latencies) / elapsed,
+        "db_round_trips_per_turn": (ROUND_TRIPS.total() - before_total) / done,
+        "db_sync_round_trips_per_turn": (ROUND_TRIPS.total(exclude_prefix=WRITER_THREAD) - before_sync) / done,
+    }
+
+
+def run_uploads(pages_list, timeout):
+    """
+    process_uploaded_document on synthetic PDFs, each in its own session.
+    """
+    from streamlit.testing.v1 import AppTest
+    from sqlite_db import ROUND_TRIPS
+    from synthetic import pdf_upload
+
+    user_id = seed_user(f"upload_{time.time_ns()}")
+
+    def session(pages):
+        at = AppTest.from_file(UPLOAD_APP, default_timeout=timeout)
+        at.session_state["bench_upload"] = pdf_upload(pages)
+        at.session_state["bench_user_id"] = user_id
+        return at
+
+    results = {}
+    if pages_list:
+        # Unmeasured: starts the extraction pool and imports the app once
+        session(max(pages_list)).run()
+    for pages in pages_list:
+        at = session(pages)
+        before = ROUND_TRIPS.total()
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+        results[f"pdf_{pages}_pages"] = {
+            "pages": pages,
+            "seconds": elapsed,
+            "pages_per_sec": pages / elapsed,
+            "db_round_trips": ROUND_TRIPS.total() - before,
+            "errors": [e.message for e in at.exception],
+        }
+    return results
+
+
+def report(results):
+    print(f"{'users':>5}  {'turns':>5}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'turns/s':>8}  {'rt/turn':>8}  {'sync rt':>8}  errors")
+    for level in results["chat"]:
+        lat = level["latency_s"]
+        print(
+            f"{level['users']:>5}  {level['turns']:>5}  {lat['p50'] * 1000:>8.1f}  {lat['p95'] * 1000:>8.1f}  "
+            f"{lat['p99'] * 1000:>8.1f}  {level['turns_per_sec']:>8.2f}  {level['db_round_trips_per_turn']:>8.1f}  "
+            f"{level['db_sync_round_trips_per_turn']:>8.1f}  {level['errors']}"
+        )
+        for sample in level["error_samples"]:
+            print(f"        {sample}")
+    for name, upload in results["uploads"].items():
+        print(
+            f"{name}: {upload['seconds']:.2f}s, {upload['pages_per_sec']:.0f} pages/s, "
+            f"{upload['db_round_trips']} round trips{', errors: ' + '; '.join(upload['errors']) if upload['errors'] else ''}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--turns", type=int, default=10, help="chat turns per simulated user")
+    parser.add_argument("--upload-pages", default="10,100", help="comma-separated synthetic PDF sizes; empty to skip")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per script run")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to baselines/{BASELINE}.json")
+    parser.add_argument("--compare", action="store_true", help="compare with the saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    setup_environment()
+    results = {
+        "chat": [run_level(int(n), args.turns, args.timeout) for n in args.users.split(",") if n],
+        "uploads": run_uploads([int(n) for n in args.upload_pages.split(",") if n], args.timeout),
+    }
+    report(results)
+
+    if args.save_baseline:
+        print(f"Saved baseline to {save_baseline(BASELINE, results)}")
+    if args.compare:
+        baseline = load_baseline(BASELINE)
+        if baseline is None:
+            print("No saved baseline to compare with.")
+            return 0
+        current = {f"users_{level['users']}": level for level in results["chat"]}
+        current.update(results["uploads"])
+        saved = {f"users_{level['users']}": level for level in baseline["chat"]}
+        saved.update(baseline["uploads"])
+        if print_comparison(compare(current, saved, args.tolerance)):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Password hashing benchmark: logins/sec per core for each parameter set.
+
+For every PASSWORD_HASH spec this measures verification on one thread, then
+through PasswordHasher's worker pool with concurrent logins, and finally
+end to end through Web_UI.check_user (SQLite stand-in database).
+
+    python benchmarks/bench_passwords.py
+    python benchmarks/bench_passwords.py --params "scrypt\\$n=32768,r=8,p=1" --workers 4 --seconds 5
+    python benchmarks/bench_passwords.py --save-baseline
+    python benchmarks/bench_passwords.py --compare --tolerance 0.2
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import REPO_DIR, setup_environment, save_baseline, load_baseline, compare, print_comparison  # noqa: E402
+
+sys.path.insert(0, REPO_DIR)
+from passwords import PasswordHasher, hasher_from_spec  # noqa: E402
+
+BASELINE = "passwords"
+DEFAULT_PARAMS = "scrypt$n=16384,r=8,p=1;scrypt$n=32768,r=8,p=1;pbkdf2_sha256$i=210000;pbkdf2_sha256$i=600000"
+PASSWORD = "correct horse battery staple"
+
+
+def _run_for(seconds, fn, threads=1):
+    """
+    Call fn repeatedly on `threads` threads for about `seconds`; returns calls/sec.
+    """
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(slot):
+        while time.perf_counter() < deadline:
+            fn()
+            counts[slot] += 1
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def bench_hasher(spec, workers, seconds):
+    hasher = hasher_from_spec(spec)
+    stored = hasher.hash(PASSWORD)
+    single = _run_for(seconds, lambda: hasher.verify(PASSWORD, stored))
+
+    passwords = PasswordHasher(hasher, max_workers=workers, max_pending=workers * 4, timeout=60)
+    pooled = _run_for(seconds, lambda: passwords.verify(PASSWORD, stored), threads=workers * 2)
+    cores = min(workers, os.cpu_count() or 1)
+    return {
+        "single_thread_logins_per_sec": single,
+        "pool_logins_per_sec": pooled,
+        "pool_logins_per_core_per_sec": pooled / cores,
+        "verify_ms": 1000 / single if single else 0.0,
+    }
+
+
+def bench_check_user(spec, workers, seconds):
+    """
+    Logins through Web_UI.check_user, including the email lookup.
+    """
+    import Web_UI
+
+    os.environ["PASSWORD_HASH"] = spec
+    os.environ["PASSWORD_HASH_WORKERS"] = str(workers)
+    Web_UI.get_password_hasher.clear()
+    email = f"bench_{time.time_ns()}@bench.local"
+    Web_UI.create_user("bench", email, PASSWORD)
+    return {
+        "check_user_logins_per_sec": _run_for(seconds, lambda: Web_UI.check_user(email, PASSWORD), threads=workers * 2),
+        "unknown_email_logins_per_sec": _run_for(seconds, lambda: Web_UI.check_user("nobody@bench.local", PASSWORD), threads=workers * 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--params", default=DEFAULT_PARAMS, help="semicolon-separated PASSWORD_HASH specs")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="PasswordHasher worker threads")
+    parser.add_argument("--seconds", type=float, default=3, help="measurement time per case")
+    parser.add_argument("--skip-app", action="store_true", help="skip the end-to-end check_user measurement")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to baselines/{BASELINE}.json")
+    parser.add_argument("--compare", action="store_true", help="compare with the saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    if not args.skip_app:
+        setup_environment()
+    results = {}
+    print(f"{os.cpu_count()} CPUs, {args.workers} hash workers")
+    print(f"{'params':<28}  {'verify ms':>9}  {'1 thread/s':>10}  {'pool/s':>8}  {'per core/s':>10}  {'app/s':>8}  {'unknown/s':>9}")
+    for spec in filter(None, (s.strip() for s in args.params.split(";"))):
+        result = bench_hasher(spec, args.workers, args.seconds)
+        if not args.skip_app:
+            result.update(bench_check_user(spec, args.workers, args.seconds))
+        results[spec] = result
+        print(
+            f"{spec:<28}  {result['verify_ms']:>9.1f}  {result['single_thread_logins_per_sec']:>10.1f}  "
+            f"{result['pool_logins_per_sec']:>8.1f}  {result['pool_logins_per_core_per_sec']:>10.1f}  "
+            f"{result.get('check_user_logins_per_sec', 0):>8.1f}  {result.get('unknown_email_logins_per_sec', 0):>9.1f}"
+        )
+
+    if args.save_baseline:
+        print(f"Saved baseline to {save_baseline(BASELINE, results)}")
+    if args.compare:
+        baseline = load_baseline(BASELINE)
+        if baseline is None:
+            print("No saved baseline to compare with.")
+            return 0
+        if print_comparison(compare(results, baseline, args.tolerance)):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import math
+import tempfile
+import threading
+
+# ------------------- Benchmark Harness -------------------
+# Shared setup for the benchmarks: a throwaway working directory, the SQLite
+# stand-in for ml_proj_db, the stub RAG pipeline on sys.path, and helpers for
+# percentiles and saved baselines.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+WEB_UI = os.path.join(REPO_DIR, "Web_UI.py")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+
+def setup_environment(workdir=None):
+    """
+    Point the app at a SQLite database, docs and results directories under
+    workdir (a new temporary directory by default) and put the stub
+    _1_Inference package first on sys.path. Returns workdir.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="chatbot-bench-")
+    for path in (os.path.join(BENCH_DIR, "stubs"), REPO_DIR, BENCH_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    os.environ["DOCS_DIR"] = os.path.join(workdir, "docs")
+    os.environ["RESULTS_DIR"] = os.path.join(workdir, "results")
+    # Small docs are extracted in-process, so worker start-up is only paid on large ones
+    os.environ.setdefault("PDF_MAX_WORKERS", "2")
+
+    from sqlite_db import install
+    install(os.path.join(workdir, "ml_proj_db.sqlite3"))
+    share_script_cache()
+    keep_test_runtime()
+    return workdir
+
+
+def share_script_cache():
+    """
+    AppTest compiles the app script with a fresh ScriptCache on every run,
+    while a real server compiles it once per process. Share one bytecode
+    cache across all simulated sessions, as the server does; this also keeps
+    concurrent sessions from compiling at the same time.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    if getattr(ScriptCache, "_bench_shared", False):
+        return
+    original = ScriptCache.get_bytecode
+    shared, lock = {}, threading.Lock()
+
+    def get_bytecode(self, script_path):
+        key = (script_path, os.stat(script_path).st_mtime_ns)
+        with lock:
+            if key not in shared:
+                shared[key] = original(self, script_path)
+            return shared[key]
+
+    ScriptCache.get_bytecode = get_bytecode
+    ScriptCache._bench_shared = True
+
+
+def keep_test_runtime():
+    """
+    AppTest installs a mock Runtime for each run and clears it afterwards,
+    which breaks sessions still running on other threads. Keep answering
+    with the most recent mock once one has been installed.
+    """
+    from streamlit.runtime.runtime import Runtime
+
+    if getattr(Runtime, "_bench_sticky", False):
+        return
+    original = Runtime.instance.__func__
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" in last:
+            return last["runtime"]
+        return original(cls)
+
+    Runtime.instance = classmethod(instance)
+    Runtime._bench_sticky = True
+
+
+def seed_user(name):
+    """
+    Insert a user directly and return its id.
+    """
+    import pymysql
+
+    conn = pymysql.connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
+                (name, f"{name}@bench.local", "x")
+            )
+            user_id = cursor.lastrowid
+        conn.commit()
+        return user_id
+    finally:
+        conn.close()
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of values (pct in 0..100).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+# ---- baselines ----
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name, results):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(name), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return baseline_path(name)
+
+
+def load_baseline(name):
+    path = baseline_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(current, baseline, tolerance, lower_is_better=True, prefix=""):
+    """
+    Compare two nested dicts of numbers. Returns [(metric, baseline, current,
+    change, regressed)] for every numeric leaf present in both; a metric
+    regresses when it moved more than tolerance (a fraction) in the wrong
+    direction. Keys ending in "_per_sec" are treated as higher-is-better.
+    """
+    rows = []
+    for key, value in current.items():
+        if key not in baseline or key in ("count", "turns", "pages", "users"):
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and isinstance(baseline[key], dict):
+            rows += compare(value, baseline[key], tolerance, lower_is_better, prefix=f"{name}.")
+        elif isinstance(value, (int, float)) and isinstance(baseline[key], (int, float)) and not isinstance(value, bool):
+            old = baseline[key]
+            change = (value - old) / old if old else 0.0
+            worse = -change if key.endswith("_per_sec") or not lower_is_better else change
+            rows.append((name, old, value, change, worse > tolerance))
+    return rows
+
+
+def print_comparison(rows):
+    width = max((len(r[0]) for r in rows), default=10)
+    print(f"{'metric':<{width}}  {'baseline':>12}  {'current':>12}  {'change':>8}")
+    for name, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<{width}}  {old:>12.4g}  {new:>12.4g}  {change:>+7.1%}{flag}")
+    return any(r[4] for r in rows)
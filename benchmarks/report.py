@@ -0,0 +1,125 @@
+"""
+Compare two saved pytest-benchmark runs, including the memory figures that
+bench_functions.py stores in extra_info.
+
+    python benchmarks/report.py                      # latest saved run vs. the one before
+    python benchmarks/report.py BASELINE.json [CURRENT.json] --tolerance 0.1
+
+Exits 1 if any benchmark's median time or peak memory grew by more than the
+tolerance. Runs are read from baselines/functions, kept apart from the
+load and password baselines that harness.save_baseline writes to baselines.
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "functions")
+
+
+def saved_runs(storage):
+    """
+    Saved run files, oldest first. pytest-benchmark writes them to one
+    subdirectory per machine and numbers them; other JSON files are skipped.
+    """
+    runs = []
+    for path in glob.glob(os.path.join(storage, "*", "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                if "benchmarks" in json.load(f):
+                    runs.append(path)
+        except (OSError, ValueError):
+            continue
+    return sorted(runs, key=os.path.basename)
+
+
+def load_run(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        b["name"]: {
+            "median": b["stats"]["median"],
+            "mean": b["stats"]["mean"],
+            "peak_bytes": b.get("extra_info", {}).get("peak_bytes"),
+            "net_blocks": b.get("extra_info", {}).get("net_blocks"),
+        }
+        for b in data["benchmarks"]
+    }
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old
+
+
+def _fmt_time(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def _fmt_bytes(value):
+    if value is None:
+        return "-"
+    for unit in ("B", "KiB", "MiB"):
+        if abs(value) < 1024 or unit == "MiB":
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+
+
+def compare_runs(baseline, current, tolerance):
+    """
+    Print a comparison table. Returns True if anything regressed.
+    """
+    regressed = False
+    names = [name for name in current if name in baseline]
+    width = max([len("benchmark")] + [len(n) for n in current])
+    print(f"{'benchmark':<{width}}  {'median':>10}  {'change':>8}  {'peak mem':>10}  {'change':>8}  {'net blocks':>10}")
+    for name in names:
+        old, new = baseline[name], current[name]
+        time_change = _change(old["median"], new["median"])
+        mem_change = _change(old["peak_bytes"], new["peak_bytes"])
+        flags = []
+        if time_change is not None and time_change > tolerance:
+            flags.append("time")
+        if mem_change is not None and mem_change > tolerance:
+            flags.append("memory")
+        regressed = regressed or bool(flags)
+        print(
+            f"{name:<{width}}  {_fmt_time(new['median']):>10}  "
+            f"{'-' if time_change is None else f'{time_change:+.1%}':>8}  "
+            f"{_fmt_bytes(new['peak_bytes']):>10}  "
+            f"{'-' if mem_change is None else f'{mem_change:+.1%}':>8}  "
+            f"{'-' if new['net_blocks'] is None else new['net_blocks']:>10}"
+            f"{'  REGRESSION (' + ', '.join(flags) + ')' if flags else ''}"
+        )
+    for name in current:
+        if name not in baseline:
+            print(f"{name:<{width}}  {_fmt_time(current[name]['median']):>10}  (new)")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare saved pytest-benchmark runs")
+    parser.add_argument("baseline", nargs="?", help="baseline run JSON (default: second-latest saved run)")
+    parser.add_argument("current", nargs="?", help="current run JSON (default: latest saved run)")
+    parser.add_argument("--storage", default=BASELINE_DIR, help="pytest-benchmark storage directory")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative increase (default 0.1)")
+    args = parser.parse_args(argv)
+
+    runs = saved_runs(args.storage)
+    current = args.current or (runs[-1] if runs else None)
+    baseline = args.baseline or (runs[-2] if len(runs) >= 2 else None)
+    if current is None or baseline is None:
+        print(f"Need two saved runs in {args.storage} (or explicit paths) to compare.")
+        return 0
+    print(f"baseline: {baseline}\ncurrent:  {current}\n")
+    return 1 if compare_runs(load_run(baseline), load_run(current), args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+import re
+import sqlite3
+import threading
+from datetime import datetime, date, timedelta
+
+# ------------------- SQLite Stand-in for ml_proj_db -------------------
+# A pymysql-compatible connection backed by a local SQLite file, so the app
+# can be benchmarked without a MySQL server. The MySQL dialect used by the
+# app is translated statement by statement. Every execute, executemany,
+# commit, rollback and ping counts as one database round trip, per thread.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS user_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    session_token TEXT,
+    ip_address TEXT,
+    user_agent TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_token ON user_sessions (session_token);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions (expires_at);
+CREATE TABLE IF NOT EXISTS security_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    event_type TEXT,
+    event_dec TEXT,
+    ip_address TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS inputs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    input_type TEXT,
+    input_txt TEXT,
+    file_path TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_id INTEGER,
+    content TEXT,
+    page_number INTEGER
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_id INTEGER,
+    generated_sql TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS execution_result (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prediction_id INTEGER,
+    result_json TEXT,
+    execution_time REAL,
+    success INTEGER,
+    error_message TEXT
+);
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prediction_id INTEGER,
+    rating INTEGER,
+    comment TEXT
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_updated ON conversations (user_id, updated_at);
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prediction_id INTEGER,
+    conversation_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    meta TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_conversation_messages_conversation ON conversation_messages (conversation_id, id);
+CREATE TABLE IF NOT EXISTS conversation_summaries (
+    conversation_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    upto_message_id INTEGER,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Conflict targets for translating ON DUPLICATE KEY UPDATE
+PRIMARY_KEYS = {
+    "conversations": "id",
+    "conversation_summaries": "conversation_id",
+}
+
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(timedelta, lambda v: v.total_seconds())
+
+
+class RoundTrips:
+    """
+    Thread-safe round-trip counter, keyed by thread name.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def hit(self):
+        name = threading.current_thread().name
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def total(self, exclude_prefix=None):
+        return sum(n for name, n in self.snapshot().items() if not (exclude_prefix and name.startswith(exclude_prefix)))
+
+
+ROUND_TRIPS = RoundTrips()
+
+_INTERVAL = re.compile(r"DATE_(ADD|SUB)\(NOW\(\),\s*INTERVAL\s+(\d+)\s+(\w+)\)", re.IGNORECASE)
+_DELETE_JOIN = re.compile(r"^\s*DELETE\s+(\w+)\s+FROM\s+(\w+)\s+\1\s+(JOIN\s.*)$", re.IGNORECASE | re.DOTALL)
+_DELETE_LIMIT = re.compile(r"^\s*DELETE\s+FROM\s+(\w+)\s+WHERE\s+(.*?)\s+LIMIT\s+(\S+)\s*$", re.IGNORECASE | re.DOTALL)
+_UPSERT = re.compile(r"^(\s*INSERT\s+INTO\s+(\w+).*?)\s+ON\s+DUPLICATE\s+KEY\s+UPDATE\s+(.*)$", re.IGNORECASE | re.DOTALL)
+
+
+def translate(sql):
+    """
+    MySQL statement -> SQLite statement, or None for statements that are
+    accepted and ignored (session settings, DDL handled by SCHEMA).
+    """
+    stripped = sql.strip()
+    upper = stripped.upper()
+    if upper.startswith("SET ") or upper.startswith("CREATE TABLE"):
+        return None
+    if "@@AUTO_INCREMENT_INCREMENT" in upper:
+        return "SELECT 1 AS step"
+    sql = _INTERVAL.sub(
+        lambda m: f"datetime('now', '{'+' if m.group(1).upper() == 'ADD' else '-'}{m.group(2)} {m.group(3).lower()}s')",
+        stripped
+    )
+    sql = re.sub(r"NOW\(\d?\)|CURRENT_TIMESTAMP\(\d\)", "CURRENT_TIMESTAMP", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\s+FOR\s+UPDATE\s*$", "", sql, flags=re.IGNORECASE)
+    match = _DELETE_JOIN.match(sql)
+    if match:
+        alias, table, rest = match.groups()
+        sql = f"DELETE FROM {table} WHERE rowid IN (SELECT {alias}.rowid FROM {table} {alias} {rest})"
+    match = _DELETE_LIMIT.match(sql)
+    if match:
+        table, where, limit = match.groups()
+        sql = f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT {limit})"
+    match = _UPSERT.match(sql)
+    if match:
+        insert, table, updates = match.groups()
+        updates = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", updates, flags=re.IGNORECASE)
+        sql = f"{insert} ON CONFLICT({PRIMARY_KEYS[table]}) DO UPDATE SET {updates}"
+    return sql.replace("%s", "?")
+
+
+class Cursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = conn._db.cursor()
+        self._rows = []
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, sql, params=None):
+        ROUND_TRIPS.hit()
+        statement = translate(sql)
+        if statement is None:
+            self._rows, self.rowcount = [], 0
+            return 0
+        if isinstance(params, dict):
+            raise TypeError("Named parameters are not supported")
+        self._cursor.execute(statement, tuple(params or ()))
+        self.rowcount = self._cursor.rowcount
+        if self._cursor.description:
+            names = [d[0] for d in self._cursor.description]
+            self._rows = [dict(zip(names, row)) for row in self._cursor.fetchall()]
+        else:
+            self._rows = []
+        if statement.lstrip().upper().startswith("INSERT") and self._cursor.lastrowid:
+            # MySQL reports the first id of a multi-row INSERT, SQLite the last
+            self.lastrowid = self._cursor.lastrowid - max(self.rowcount, 1) + 1
+        return self.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        ROUND_TRIPS.hit()
+        statement = translate(sql)
+        if statement is None:
+            return 0
+        self._cursor.executemany(statement, [tuple(p) for p in seq_of_params])
+        self.rowcount = self._cursor.rowcount
+        self._rows = []
+        return self.rowcount
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchall_unbuffered(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    """
+    The subset of pymysql.Connection the app uses, with DictCursor rows.
+    """
+
+    def __init__(self, path):
+        # TIMESTAMP columns come back as datetime, as pymysql returns DATETIME
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self.open = True
+
+    @property
+    def server_status(self):
+        # SERVER_STATUS_IN_TRANS
+        return 1 if self._db.in_transaction else 0
+
+    def cursor(self, cursorclass=None):
+        return Cursor(self)
+
+    def commit(self):
+        ROUND_TRIPS.hit()
+        self._db.commit()
+
+    def rollback(self):
+        ROUND_TRIPS.hit()
+        self._db.rollback()
+
+    def ping(self, reconnect=False):
+        ROUND_TRIPS.hit()
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self._db.close()
+
+
+def create_database(path):
+    """
+    Create the app's tables in a SQLite file.
+    """
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.commit()
+    db.close()
+
+
+def install(path):
+    """
+    Route pymysql.connect() to the SQLite file at path, creating its tables.
+    Returns the previous pymysql.connect.
+    """
+    import pymysql
+
+    create_database(path)
+    original = pymysql.connect
+    pymysql.connect = lambda *args, **kwargs: Connection(path)
+    return original
@@ -0,0 +1,34 @@
+import os
+import time
+
+# ------------------- Benchmark RAG Stub -------------------
+# Deterministic stand-in for the real _1_Inference.rag_pipeline, with the
+# echo replies of initial_test.py. BENCH_AGENT_LATENCY (seconds) adds a fixed
+# delay per answer to model LLM time.
+
+
+class RagPipeline:
+    def __init__(self):
+        self.initialized = False
+        self.reloads = 0
+
+    def initialize(self):
+        self.initialized = True
+
+    def reload_documents(self, docs_dir):
+        self.reloads += 1
+
+
+rag_pipeline = RagPipeline()
+
+
+def run_agent(user_input, chat_history):
+    """
+    Returns (answer, sources) like the real run_agent.
+    """
+    latency = float(os.getenv("BENCH_AGENT_LATENCY", "0"))
+    if latency:
+        time.sleep(latency)
+    if "hello" in user_input.lower() and not chat_history:
+        return "Hi, how can I help you today?", []
+    return f"You said: {user_input}", []
@@ -0,0 +1,57 @@
+import io
+import uuid
+
+# ------------------- Synthetic Inputs -------------------
+# Generated documents and uploads for the benchmarks.
+
+
+def make_pdf(pages, words_per_page=200, seed=""):
+    """
+    A valid PDF with one text page per page number, built without any PDF
+    library. seed is written on the first page to make the content unique.
+    """
+    text = " ".join(f"word{i % 97}" for i in range(words_per_page))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(pages))}] /Count {pages} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        stream = f"BT /F1 10 Tf 72 720 Td (Page {i + 1}{' ' + seed if i == 0 and seed else ''}: {text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    out.write(b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+class FakeUpload(io.BytesIO):
+    """
+    Stand-in for Streamlit's UploadedFile (name, type, size, file_id).
+    """
+
+    def __init__(self, data, name, mime_type):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+        self.size = len(data)
+        self.file_id = uuid.uuid4().hex
+
+
+def pdf_upload(pages, name=None):
+    """
+    An uploaded synthetic PDF; each call produces distinct content.
+    """
+    return FakeUpload(make_pdf(pages, seed=uuid.uuid4().hex), name or f"synthetic-{pages}.pdf", "application/pdf")
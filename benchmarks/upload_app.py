@@ -0,0 +1,11 @@
+"""
+App script for the upload benchmarks: processes st.session_state["bench_upload"]
+for st.session_state["bench_user_id"]. Guarded by __main__ so PDF worker
+processes, which re-import the main script, do not run it.
+"""
+import streamlit as st
+
+import Web_UI
+
+if __name__ == "__main__":
+    Web_UI.process_uploaded_document(st.session_state["bench_upload"], st.session_state["bench_user_id"])
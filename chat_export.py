@@ -0,0 +1,53 @@
+import json
+import tempfile
+
+# ------------------- Chat Export -------------------
+# Transcripts are produced on demand from an iterable of messages (e.g. the
+# conversation store's batched reader) and written chunk by chunk, so even
+# long conversations are never held in memory as one string.
+
+# format -> (mime type, file extension)
+EXPORT_FORMATS = {
+    "md": ("text/markdown", ".md"),
+    "json": ("application/json", ".json"),
+    "txt": ("text/plain", ".txt"),
+}
+
+
+def _speaker(message):
+    return "You" if message["role"] == "user" else "Bot"
+
+
+def iter_export(title, messages, fmt="txt"):
+    """
+    Yield the transcript of messages as text chunks in fmt ("md", "json" or "txt").
+    """
+    if fmt == "txt":
+        for i, m in enumerate(messages):
+            yield ("\n" if i else "") + f"{_speaker(m)}: {m['content']}"
+    elif fmt == "md":
+        yield f"# {title}\n"
+        for m in messages:
+            yield f"\n**{_speaker(m)}:** {m['content']}\n"
+    elif fmt == "json":
+        yield '{"title": ' + json.dumps(title) + ', "messages": ['
+        for i, m in enumerate(messages):
+            record = {"role": m["role"], "content": m["content"]}
+            if m.get("sources"):
+                record["sources"] = m["sources"]
+            yield (", " if i else "") + json.dumps(record, default=str)
+        yield "]}\n"
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_to_file(title, messages, fmt="txt"):
+    """
+    Write the transcript to a temporary file.
+    Returns an open binary file positioned at the start.
+    """
+    out = tempfile.TemporaryFile()
+    for chunk in iter_export(title, messages, fmt):
+        out.write(chunk.encode("utf-8"))
+    out.seek(0)
+    return out
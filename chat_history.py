@@ -0,0 +1,105 @@
+import re
+
+# ------------------- Chat History -------------------
+# The agent gets a bounded history: the last few turns verbatim, plus a
+# rolling summary of everything older. The summary is only extended with the
+# messages that aged out since it was last built, so it is never recomputed
+# from the whole conversation.
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about 4 characters per token for English text).
+    """
+    return len(text) // 4 + 1 if text else 0
+
+
+def _first_sentence(text, max_chars=200):
+    text = " ".join(text.split())
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars - 3].rstrip() + "..."
+
+
+def extractive_summary(previous, messages, max_tokens):
+    """
+    Append the first sentence of each message to the previous summary and
+    drop the oldest lines while it is over max_tokens.
+    """
+    lines = previous.splitlines() if previous else []
+    lines += [f"{'User' if role == 'user' else 'Bot'}: {_first_sentence(content)}" for role, content in messages]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    """
+    Builds the chat_history passed to the agent.
+    The newest max_turns turns (user + bot message pairs) are kept verbatim as
+    long as they fit in token_budget together with the summary; older
+    messages are folded into a summary of at most summary_tokens.
+    summarize(text) -> str, if given, is used instead of the extractive
+    summary and receives the previous summary followed by the new messages.
+    """
+
+    def __init__(self, max_turns=6, token_budget=2000, summary_tokens=400, summarize=None):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize
+
+    def build(self, messages, state, message_id):
+        """
+        messages: the loaded messages of a chat, oldest first.
+        state: {"summary": str, "upto": id of the last folded message or None},
+        updated in place; it also remembers the last folded message's msg_key,
+        for messages whose id is not known. message_id(msg) returns a
+        message's store id, or None if it is not known (yet).
+        Returns (chat_history, changed) where changed says whether state was
+        updated and should be saved.
+        """
+        verbatim = list(messages[-2 * self.max_turns:]) if self.max_turns else []
+        older = list(messages[:len(messages) - len(verbatim)])
+        summary_cost = min(estimate_tokens(state["summary"]), self.summary_tokens)
+        used = summary_cost + sum(estimate_tokens(m["content"]) for m in verbatim)
+        while verbatim and used > self.token_budget:
+            msg = verbatim.pop(0)
+            used -= estimate_tokens(msg["content"])
+            older.append(msg)
+
+        # Only messages after the last folded one (found by id, or by key if its id is unknown)
+        upto, upto_key = state["upto"], state.get("upto_key")
+        folded = 0
+        for i, m in enumerate(older):
+            mid = message_id(m)
+            if (upto_key is not None and m.get("msg_key") == upto_key) or (mid is not None and upto is not None and mid <= upto):
+                folded = i + 1
+        older = older[folded:]
+        changed = False
+        if older:
+            state["summary"] = self._fold(state["summary"], [(m["role"], m["content"]) for m in older])
+            state["upto_key"] = older[-1].get("msg_key")
+            known = [mid for mid in map(message_id, older) if mid is not None]
+            if known:
+                state["upto"] = known[-1]
+            changed = True
+
+        history = [(m["role"], m["content"]) for m in verbatim]
+        if state["summary"]:
+            history.insert(0, ("system", f"{SUMMARY_PREFIX}\n{state['summary']}"))
+        return history, changed
+
+    def _fold(self, previous, messages):
+        if self.summarize is None:
+            return extractive_summary(previous, messages, self.summary_tokens)
+        text = "\n".join(
+            ([previous] if previous else []) +
+            [f"{'User' if role == 'user' else 'Bot'}: {content}" for role, content in messages]
+        )
+        summary = self.summarize(text)
+        # Keep the summary inside its budget whatever the summarizer returned
+        max_chars = self.summary_tokens * 4
+        return summary if len(summary) <= max_chars else summary[-max_chars:]
@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+from itertools import islice
+from collections import OrderedDict
+
+# ------------------- Conversation Index -------------------
+# Chat ids are ULIDs: a 48-bit millisecond timestamp followed by 80 random
+# bits, in Crockford base32. They are unique without coordination, sort by
+# creation time, and are strictly increasing within a process even when
+# several are created in the same millisecond.
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_MAX = (1 << 80) - 1
+
+_ulid_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        chars.append(_CROCKFORD[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def new_ulid():
+    """
+    A new 26-character ULID, greater than every ULID returned before it.
+    Within one millisecond the random part is incremented instead of redrawn.
+    """
+    global _last_ms, _last_random
+    with _ulid_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _last_ms:
+            ms = _last_ms
+            if _last_random == _RANDOM_MAX:
+                # Random part exhausted for this millisecond: borrow the next one
+                ms += 1
+                _last_random = int.from_bytes(os.urandom(10), "big") >> 1
+            else:
+                _last_random += 1
+        else:
+            # Leave headroom so increments within the millisecond cannot overflow
+            _last_random = int.from_bytes(os.urandom(10), "big") >> 1
+        _last_ms = ms
+        return _encode(ms, 10) + _encode(_last_random, 16)
+
+
+class ConversationIndex:
+    """
+    Conversation headers of one user, most recently updated first.
+    Lookup, add, touch (move to front), rename and remove are O(1); pages
+    are read by position.
+    Headers are dicts with "title", "created" and "updated".
+    """
+
+    def __init__(self):
+        self._headers = OrderedDict()
+
+    def __contains__(self, conversation_id):
+        return conversation_id in self._headers
+
+    def __len__(self):
+        return len(self._headers)
+
+    def get(self, conversation_id):
+        return self._headers.get(conversation_id)
+
+    def first(self):
+        """
+        Id of the most recently updated conversation, or None.
+        """
+        return next(iter(self._headers), None)
+
+    def add(self, conversation_id, title, created, updated=None):
+        """
+        Add a conversation at the front of the index.
+        """
+        self._headers[conversation_id] = {"title": title, "created": created, "updated": updated or created}
+        self._headers.move_to_end(conversation_id, last=False)
+        return self._headers[conversation_id]
+
+    def append(self, conversation_id, title, created, updated):
+        """
+        Add an older conversation at the end, e.g. the next page read from the
+        store. Conversations already indexed keep their position.
+        """
+        if conversation_id not in self._headers:
+            self._headers[conversation_id] = {"title": title, "created": created, "updated": updated}
+
+    def touch(self, conversation_id, updated):
+        """
+        Mark a conversation as updated and move it to the front.
+        """
+        header = self._headers[conversation_id]
+        header["updated"] = updated
+        self._headers.move_to_end(conversation_id, last=False)
+        return header
+
+    def rename(self, conversation_id, title):
+        self._headers[conversation_id]["title"] = title
+
+    def remove(self, conversation_id):
+        self._headers.pop(conversation_id, None)
+
+    def clear(self):
+        self._headers.clear()
+
+    def page(self, offset, count):
+        """
+        [(id, header)] for positions offset to offset + count.
+        """
+        return list(islice(self._headers.items(), offset, offset + count))
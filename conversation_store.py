@@ -0,0 +1,260 @@
+import json
+from datetime import datetime
+
+# ------------------- Conversation Store -------------------
+# Conversations live in the app database rather than in session state. The
+# sidebar only reads headers (id, title, timestamps); messages are read a page
+# at a time when a chat is opened. New messages go through the TelemetryWriter,
+# so a chat turn never waits on these writes.
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id VARCHAR(32) NOT NULL PRIMARY KEY,
+        user_id INT NOT NULL,
+        title VARCHAR(255) NOT NULL,
+        created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+        updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+        INDEX idx_conversations_user_updated (user_id, updated_at)
+    ) DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conversation_messages (
+        id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        prediction_id INT NULL,
+        conversation_id VARCHAR(32) NOT NULL,
+        role VARCHAR(16) NOT NULL,
+        content MEDIUMTEXT NOT NULL,
+        meta JSON NULL,
+        created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+        INDEX idx_conversation_messages_conversation (conversation_id, id)
+    ) DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conversation_summaries (
+        conversation_id VARCHAR(32) NOT NULL PRIMARY KEY,
+        summary MEDIUMTEXT NOT NULL,
+        upto_message_id BIGINT NULL,
+        updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+    ) DEFAULT CHARSET=utf8mb4
+    """,
+)
+
+# Message keys stored as columns; everything else goes into meta
+_COLUMNS = ("id", "msg_key", "role", "content", "prediction_id")
+
+
+def serialize_sources(sources):
+    """
+    Source documents as JSON-friendly dicts ({"page_content", "metadata"}).
+    Accepts LangChain Documents or dicts already in that form.
+    """
+    if not sources:
+        return None
+    out = []
+    for doc in sources:
+        if isinstance(doc, dict):
+            out.append({"page_content": doc.get("page_content", ""), "metadata": doc.get("metadata") or {}})
+        else:
+            out.append({"page_content": doc.page_content, "metadata": dict(getattr(doc, "metadata", None) or {})})
+    return out
+
+
+class ConversationStore:
+    """
+    Reads conversations from the app database and queues writes through a
+    TelemetryWriter. Every read and write is scoped to the owning user.
+    """
+
+    def __init__(self, pool, writer):
+        self.pool = pool
+        self.writer = writer
+
+    def ensure_schema(self):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+            conn.commit()
+
+    # ---- headers ----
+
+    def list_headers(self, user_id, limit=50, before=None):
+        """
+        The user's conversation headers, most recently updated first.
+        before=(updated_at, id) of the last header already read continues the
+        listing from there (keyset pagination).
+        """
+        sql = "SELECT id, title, created_at, updated_at FROM conversations WHERE user_id=%s"
+        params = [user_id]
+        if before is not None:
+            sql += " AND (updated_at < %s OR (updated_at = %s AND id < %s))"
+            params += [before[0], before[0], before[1]]
+        sql += " ORDER BY updated_at DESC, id DESC LIMIT %s"
+        params.append(limit)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+
+    def search_headers(self, user_id, query, limit=20, offset=0):
+        """
+        Headers whose title contains query, most recently updated first.
+        """
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, title, created_at, updated_at FROM conversations "
+                    "WHERE user_id=%s AND title LIKE %s ORDER BY updated_at DESC, id DESC LIMIT %s OFFSET %s",
+                    (user_id, pattern, limit, offset)
+                )
+                return cursor.fetchall()
+
+    def save_header(self, user_id, conversation_id, title):
+        """
+        Queue an upsert of the header, bumping updated_at.
+        """
+        return self.writer.submit_conversation(conversation_id, user_id, title, datetime.now())
+
+    def rename(self, user_id, conversation_id, title):
+        """
+        Queue a title change; it is applied after the header's queued upserts.
+        """
+        return self.writer.submit_statements([
+            ("UPDATE conversations SET title=%s WHERE id=%s AND user_id=%s", (title, conversation_id, user_id)),
+        ])
+
+    def delete(self, user_id, conversation_id):
+        """
+        Queue the deletion of a conversation and its messages. It runs after
+        the writes queued before it, so they cannot recreate it afterwards.
+        """
+        return self.writer.submit_statements([
+            (
+                "DELETE s FROM conversation_summaries s JOIN conversations c ON c.id = s.conversation_id "
+                "WHERE c.id=%s AND c.user_id=%s",
+                (conversation_id, user_id)
+            ),
+            (
+                "DELETE m FROM conversation_messages m JOIN conversations c ON c.id = m.conversation_id "
+                "WHERE c.id=%s AND c.user_id=%s",
+                (conversation_id, user_id)
+            ),
+            ("DELETE FROM conversations WHERE id=%s AND user_id=%s", (conversation_id, user_id)),
+        ])
+
+    def delete_all(self, user_id):
+        """
+        Queue the deletion of all of the user's conversations.
+        """
+        return self.writer.submit_statements([
+            (
+                "DELETE s FROM conversation_summaries s JOIN conversations c ON c.id = s.conversation_id "
+                "WHERE c.user_id=%s",
+                (user_id,)
+            ),
+            (
+                "DELETE m FROM conversation_messages m JOIN conversations c ON c.id = m.conversation_id "
+                "WHERE c.user_id=%s",
+                (user_id,)
+            ),
+            ("DELETE FROM conversations WHERE user_id=%s", (user_id,)),
+        ])
+
+    # ---- summaries ----
+
+    def load_summary(self, user_id, conversation_id):
+        """
+        The conversation's rolling summary as {"summary", "upto"}, where upto
+        is the id of the last message folded into it.
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT s.summary, s.upto_message_id FROM conversation_summaries s "
+                    "JOIN conversations c ON c.id = s.conversation_id WHERE c.id=%s AND c.user_id=%s",
+                    (conversation_id, user_id)
+                )
+                row = cursor.fetchone()
+        if row is None:
+            return {"summary": "", "upto": None}
+        return {"summary": row["summary"], "upto": row["upto_message_id"]}
+
+    def save_summary(self, conversation_id, summary, upto):
+        """
+        Queue an upsert of the rolling summary.
+        """
+        return self.writer.submit_summary(conversation_id, summary, upto, datetime.now())
+
+    # ---- messages ----
+
+    def load_messages(self, user_id, conversation_id, limit=50, before_id=None):
+        """
+        Up to limit messages older than before_id (default: the newest ones),
+        in chronological order. Returns (messages, has_more).
+        """
+        sql = (
+            "SELECT m.id, m.prediction_id, m.role, m.content, m.meta FROM conversation_messages m "
+            "JOIN conversations c ON c.id = m.conversation_id WHERE c.id=%s AND c.user_id=%s"
+        )
+        params = [conversation_id, user_id]
+        if before_id is not None:
+            sql += " AND m.id < %s"
+            params.append(before_id)
+        sql += " ORDER BY m.id DESC LIMIT %s"
+        params.append(limit + 1)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+        has_more = len(rows) > limit
+        return [self._message(row) for row in reversed(rows[:limit])], has_more
+
+    def iter_messages(self, user_id, conversation_id, batch_size=500):
+        """
+        Yield every message of a conversation in chronological order, reading
+        batch_size rows per query.
+        """
+        after_id = 0
+        while True:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT m.id, m.prediction_id, m.role, m.content, m.meta FROM conversation_messages m "
+                        "JOIN conversations c ON c.id = m.conversation_id "
+                        "WHERE c.id=%s AND c.user_id=%s AND m.id > %s ORDER BY m.id LIMIT %s",
+                        (conversation_id, user_id, after_id, batch_size)
+                    )
+                    rows = cursor.fetchall()
+            for row in rows:
+                yield self._message(row)
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]["id"]
+
+    def append_message(self, conversation_id, message, prediction_ref=None):
+        """
+        Queue a message dict (role, content and any extra keys, which are kept
+        in meta). Returns a Future resolving to the message id.
+        """
+        meta = {k: v for k, v in message.items() if k not in _COLUMNS and v is not None}
+        return self.writer.submit_message(
+            conversation_id,
+            message["role"],
+            message["content"],
+            meta=json.dumps(meta, default=str) if meta else None,
+            prediction_ref=prediction_ref
+        )
+
+    @staticmethod
+    def _message(row):
+        message = json.loads(row["meta"]) if row["meta"] else {}
+        message.update({
+            "id": row["id"],
+            "msg_key": str(row["id"]),
+            "role": row["role"],
+            "content": row["content"],
+            "prediction_id": row["prediction_id"],
+        })
+        return message
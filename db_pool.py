@@ -0,0 +1,235 @@
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+# ------------------- Connection Pool -------------------
+# A small, thread-safe pool of pymysql connections. One instance is shared by
+# every Streamlit session in the process (see get_app_db_pool in Web_UI.py);
+# users' target databases get one pool each through a PoolGroup.
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of pymysql connections.
+    Connections are health-checked before reuse when they have been idle for
+    longer than ping_interval, and recycled once they are older than max_age.
+    """
+
+    def __init__(self, connect, max_size=10, max_age=1800, ping_interval=30, timeout=10):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_age = max_age
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+
+        self._lock = threading.Condition()
+        self._idle = []  # [(conn, created_at, last_used)]
+        self._created_at = {}  # id(conn) -> created_at, for checked-out connections
+        self._size = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._recycled = 0
+        self._discarded = 0
+
+    # ---- checkout / release ----
+
+    def acquire(self):
+        """
+        Check out a connection, opening a new one if the pool is not full.
+        Blocks up to `timeout` seconds; raises PoolTimeout otherwise.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._lock:
+            while True:
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                self._lock.wait(remaining)
+
+        if conn is not None:
+            conn = self._validate(conn, created_at, last_used)
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+                raise
+            created_at = time.monotonic()
+            with self._lock:
+                self._opened += 1
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self._created_at[id(conn)] = created_at
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn, discard=False):
+        """
+        Return a connection to the pool.
+        Any transaction left open (e.g. by a plain SELECT) is rolled back so the
+        next borrower does not inherit a stale snapshot. Pass discard=True to
+        close the connection instead, e.g. after a network error.
+        """
+        with self._lock:
+            created_at = self._created_at.pop(id(conn), time.monotonic())
+        if not discard and conn.open and conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._closed or not conn.open:
+            self._close(conn)
+            with self._lock:
+                self._size -= 1
+                self._discarded += 1
+                self._lock.notify()
+            return
+        with self._lock:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and always returns it.
+        Connections that raised a pymysql OperationalError/InterfaceError are
+        discarded rather than reused.
+        """
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    # ---- health ----
+
+    def _validate(self, conn, created_at, last_used):
+        """
+        Return conn if it is still usable, otherwise close it and return None
+        (the caller then opens a replacement in the same slot).
+        """
+        now = time.monotonic()
+        if now - created_at > self.max_age:
+            self._close(conn)
+            with self._lock:
+                self._recycled += 1
+            return None
+        if now - last_used > self.ping_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._close(conn)
+                with self._lock:
+                    self._discarded += 1
+                return None
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """
+        Close every idle connection. Checked-out connections are closed when
+        they are released.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    # ---- metrics ----
+
+    def stats(self):
+        """
+        Snapshot of pool usage and checkout-wait metrics.
+        """
+        with self._lock:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "wait_total_s": self._wait_total,
+                "wait_avg_s": self._wait_total / self._checkouts if self._checkouts else 0.0,
+                "wait_max_s": self._wait_max,
+                "timeouts": self._timeouts,
+                "opened": self._opened,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+            }
+
+
+class PoolGroup:
+    """
+    A set of ConnectionPools keyed by target database, e.g. one per distinct
+    user_db_connection_details. At most max_pools are kept; the least recently
+    used pool is closed when another one is needed.
+    """
+
+    def __init__(self, max_pools=32, **pool_options):
+        self.max_pools = max_pools
+        self.pool_options = pool_options
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, connect):
+        """
+        Return the pool for key, creating it with connect() as its factory.
+        """
+        evicted = []
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = ConnectionPool(connect, **self.pool_options)
+                while len(self._pools) > self.max_pools:
+                    evicted.append(self._pools.popitem(last=False)[1])
+            self._pools.move_to_end(key)
+        for old in evicted:
+            old.close_all()
+        return pool
+
+    def stats(self):
+        """
+        Per-pool stats, keyed by pool key.
+        """
+        with self._lock:
+            pools = list(self._pools.items())
+        return {key: pool.stats() for key, pool in pools}
@@ -0,0 +1,289 @@
+import os
+import re
+import hmac
+import base64
+import hashlib
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+# ------------------- Password Hashing -------------------
+# Salted, parameterized password hashes stored as
+# "scheme$param=value,...$salt$hash" (argon2 uses its own "$argon2id$..."
+# format). The parameters are read back from each stored hash, so hashes made
+# with older settings keep verifying and are rehashed with the current ones
+# on the next successful login. Unsalted SHA-256 hex digests from before are
+# recognized as legacy and rehashed the same way.
+#
+# KDF work runs in a small bounded thread pool: hashlib releases the GIL while
+# deriving, so other sessions keep rerunning, and a login storm queues up
+# instead of taking every core.
+
+
+class PasswordHashBusy(RuntimeError):
+    """Raised when too many hash/verify jobs are already waiting."""
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def parse_spec(spec):
+    """
+    "scrypt$n=16384,r=8,p=1" -> ("scrypt", {"n": 16384, "r": 8, "p": 1}).
+    """
+    scheme, _, params = spec.partition("$")
+    values = {}
+    for pair in filter(None, params.split(",")):
+        key, _, value = pair.partition("=")
+        values[key.strip()] = int(value)
+    return scheme.strip(), values
+
+
+class _KdfHasher:
+    """
+    Base for hashlib KDFs. Subclasses set scheme and defaults and implement
+    _derive(password, salt, **params).
+    """
+    scheme = None
+    defaults = {}
+
+    def __init__(self, salt_bytes=16, dklen=32, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown {self.scheme} parameters: {', '.join(sorted(unknown))}")
+        self.params = {**self.defaults, **params}
+        self.salt_bytes = salt_bytes
+        self.dklen = dklen
+
+    @property
+    def prefix(self):
+        return f"{self.scheme}${','.join(f'{k}={v}' for k, v in self.params.items())}$"
+
+    def identify(self, encoded):
+        return encoded.startswith(f"{self.scheme}$")
+
+    def hash(self, password):
+        salt = os.urandom(self.salt_bytes)
+        key = self._derive(password.encode("utf-8"), salt, self.dklen, **self.params)
+        return f"{self.prefix}{_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, password, encoded):
+        try:
+            _, params, salt, key = encoded.split("$")
+            _, params = parse_spec(f"{self.scheme}${params}")
+            salt, key = _b64decode(salt), _b64decode(key)
+        except ValueError:
+            return False
+        return hmac.compare_digest(self._derive(password.encode("utf-8"), salt, len(key), **params), key)
+
+    def needs_rehash(self, encoded):
+        return not encoded.startswith(self.prefix)
+
+    def _derive(self, password, salt, dklen, **params):
+        raise NotImplementedError
+
+
+class ScryptHasher(_KdfHasher):
+    """
+    scrypt; n is the CPU/memory cost (about 128 * n * r bytes per hash).
+    """
+    scheme = "scrypt"
+    defaults = {"n": 2 ** 14, "r": 8, "p": 1}
+
+    def _derive(self, password, salt, dklen, n, r, p):
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, dklen=dklen, maxmem=128 * r * (n + p + 2) + 2 ** 20)
+
+
+class Pbkdf2Hasher(_KdfHasher):
+    """
+    PBKDF2-HMAC-SHA256 with i iterations.
+    """
+    scheme = "pbkdf2_sha256"
+    defaults = {"i": 600000}
+
+    def _derive(self, password, salt, dklen, i):
+        return hashlib.pbkdf2_hmac("sha256", password, salt, i, dklen)
+
+
+class Argon2Hasher:
+    """
+    argon2id through the optional argon2-cffi package (t: time cost,
+    m: memory cost in KiB, p: parallelism).
+    """
+    scheme = "argon2"
+
+    def __init__(self, t=3, m=65536, p=4):
+        try:
+            import argon2
+        except ImportError as e:
+            raise RuntimeError("argon2 password hashing needs the argon2-cffi package") from e
+        self._errors = (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError)
+        self._hasher = argon2.PasswordHasher(time_cost=t, memory_cost=m, parallelism=p)
+        self.params = {"t": t, "m": m, "p": p}
+
+    def identify(self, encoded):
+        return encoded.startswith("$argon2")
+
+    def hash(self, password):
+        return self._hasher.hash(password)
+
+    def verify(self, password, encoded):
+        try:
+            return self._hasher.verify(encoded, password)
+        except self._errors:
+            return False
+
+    def needs_rehash(self, encoded):
+        return self._hasher.check_needs_rehash(encoded)
+
+
+class LegacySha256Hasher:
+    """
+    Unsalted SHA-256 hex digests, as stored before salted hashing. Verify only.
+    """
+    scheme = "sha256"
+    params = {}
+    _pattern = re.compile(r"[0-9a-f]{64}")
+
+    def identify(self, encoded):
+        return bool(self._pattern.fullmatch(encoded))
+
+    def hash(self, password):
+        raise ValueError("Legacy SHA-256 hashes are verify-only")
+
+    def verify(self, password, encoded):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+
+    def needs_rehash(self, encoded):
+        return True
+
+
+SCHEMES = {
+    ScryptHasher.scheme: ScryptHasher,
+    Pbkdf2Hasher.scheme: Pbkdf2Hasher,
+    Argon2Hasher.scheme: Argon2Hasher,
+}
+
+
+def hasher_from_spec(spec):
+    """
+    Build a hasher from a spec such as "scrypt$n=16384,r=8,p=1" or
+    "pbkdf2_sha256$i=600000"; omitted parameters use the scheme's defaults.
+    """
+    scheme, params = parse_spec(spec)
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unknown password hash scheme {scheme!r} (expected one of {', '.join(SCHEMES)})")
+    return SCHEMES[scheme](**params)
+
+
+class PasswordHasher:
+    """
+    Hashes new passwords with `default` and verifies stored hashes of any
+    known scheme. hash() and verify() run on a pool of max_workers threads;
+    at most max_pending jobs may be in progress, beyond that PasswordHashBusy
+    is raised at once. A job that has not finished after timeout seconds
+    also raises PasswordHashBusy.
+    """
+
+    def __init__(self, default, max_workers=None, max_pending=64, timeout=10):
+        self.default = default
+        # Other schemes with their default parameters; stored hashes carry their own
+        self._hashers = [default]
+        for scheme, cls in SCHEMES.items():
+            if scheme != default.scheme:
+                try:
+                    self._hashers.append(cls())
+                except RuntimeError:
+                    pass  # optional dependency not installed
+        self._hashers.append(LegacySha256Hasher())
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(4, os.cpu_count() or 1),
+            thread_name_prefix="password-hash"
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._dummy = None
+        self._lock = threading.Lock()
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+
+    def identify(self, encoded):
+        """
+        The hasher that produced encoded, or None if the format is unknown.
+        """
+        for hasher in self._hashers:
+            if hasher.identify(encoded):
+                return hasher
+        return None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashBusy("Too many password checks in progress")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordHashBusy("Password check timed out") from None
+
+    def hash(self, password):
+        """
+        A new salted hash of password with the default scheme.
+        """
+        return self._run(self.default.hash, password)
+
+    def verify(self, password, encoded):
+        """
+        Check password against a stored hash. Returns (ok, new_hash), where
+        new_hash is a fresh hash with the current settings if the stored one
+        is legacy or outdated, else None.
+        """
+        return self._run(self._verify, password, encoded)
+
+    def _verify(self, password, encoded):
+        hasher = self.identify(encoded or "")
+        ok = hasher is not None and hasher.verify(password, encoded)
+        new_hash = None
+        if ok and (hasher is not self.default or self.default.needs_rehash(encoded)):
+            new_hash = self.default.hash(password)
+        with self._lock:
+            self.verified += 1
+            if new_hash:
+                self.rehashed += 1
+        return ok, new_hash
+
+    def verify_dummy(self, password):
+        """
+        Verify against a throwaway hash and return False, so a login for an
+        unknown email costs as much as a wrong password on an account hashed
+        with the default scheme. Accounts still on legacy SHA-256 hashes
+        answer a wrong password much faster, so until they have all been
+        migrated an unknown email can be told apart from them by timing.
+        """
+        if self._dummy is None:
+            self._dummy = self.hash(secrets.token_hex(16))
+        self.verify(password, self._dummy)
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "scheme": self.default.scheme,
+                "params": dict(self.default.params),
+                "verified": self.verified,
+                "rehashed": self.rehashed,
+                "rejected": self.rejected,
+            }
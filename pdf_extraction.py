@@ -0,0 +1,111 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from PyPDF2 import PdfReader
+
+# ------------------- PDF Extraction -------------------
+# Page text extraction is CPU bound, so large PDFs are split into page ranges
+# and extracted in a pool of worker processes. Pages are yielded as soon as
+# their range finishes, so callers can store/index them while the rest of the
+# document is still being extracted.
+
+
+def _init_worker(max_memory_mb):
+    """
+    Worker initializer: cap the address space of each extraction process.
+    """
+    if not max_memory_mb:
+        return
+    try:
+        import resource
+        limit = int(max_memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        # Not supported on this platform; run without a cap
+        pass
+
+
+def _extract_range(file_path, start, stop):
+    """
+    Extract pages [start, stop) of a PDF. Runs inside a worker process.
+    Returns a list of (page_number, text) with 1-based page numbers.
+    """
+    reader = PdfReader(file_path)
+    return [(i + 1, reader.pages[i].extract_text()) for i in range(start, stop)]
+
+
+class PdfExtractor:
+    """
+    Extracts PDF text with a shared pool of worker processes.
+    max_workers caps the number of processes, pages_per_task sets the size of
+    each page range, and max_memory_mb caps the memory of each worker.
+    Documents no larger than one page range are extracted in-process.
+    """
+
+    def __init__(self, max_workers=None, pages_per_task=8, max_memory_mb=None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.pages_per_task = pages_per_task
+        self.max_memory_mb = max_memory_mb
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    # spawn: forking a multi-threaded Streamlit server is unsafe
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.max_memory_mb,)
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def extract(self, file_path, on_progress=None):
+        """
+        Yield (page_number, text) for every page of the PDF at file_path, in
+        completion order. on_progress(done, total) is called after each range.
+        """
+        total = len(PdfReader(file_path).pages)
+        if total <= self.pages_per_task:
+            pages = _extract_range(file_path, 0, total)
+            if on_progress:
+                on_progress(total, total)
+            yield from pages
+            return
+
+        executor = self._get_executor()
+        futures = [
+            executor.submit(_extract_range, file_path, start, min(start + self.pages_per_task, total))
+            for start in range(0, total, self.pages_per_task)
+        ]
+        done = 0
+        try:
+            for future in as_completed(futures):
+                pages = future.result()
+                done += len(pages)
+                if on_progress:
+                    on_progress(done, total)
+                yield from pages
+        except BrokenProcessPool:
+            # A worker died (e.g. hit its memory cap); start fresh next time
+            self._reset_executor()
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+        self._reset_executor()
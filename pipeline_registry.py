@@ -0,0 +1,242 @@
+import os
+import time
+import logging
+import threading
+import contextlib
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# ------------------- RAG Pipeline Registry -------------------
+# One warm RAG pipeline per distinct target database, shared by every session
+# connected to it. Sessions hold leases on a pipeline; pipelines without live
+# leases are evicted least-recently-used first once the registry exceeds its
+# count or memory budget. A lease that is not touched for lease_ttl seconds
+# (e.g. the browser tab was closed) no longer keeps its pipeline alive.
+
+_ENV_LOCK = threading.Lock()
+
+
+def initialize_with_env(pipeline, env):
+    """
+    Call pipeline.initialize() with env temporarily applied to os.environ.
+    The pipeline reads its connection settings (MYSQL_URL) from the
+    environment, so initializations are serialized process-wide.
+    """
+    with _ENV_LOCK:
+        previous = {name: os.environ.get(name) for name in env}
+        os.environ.update(env)
+        try:
+            pipeline.initialize()
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    return pipeline
+
+
+class SwitchGate:
+    """
+    Guards one shared pipeline that is initialized for one key (target
+    database) at a time. Runs for the current key proceed concurrently; a
+    run for another key waits until the runs in flight have finished,
+    switches the pipeline, and holds back new runs for the old key while it
+    waits so it is not starved.
+    """
+
+    def __init__(self):
+        self.key = None
+        self._running = 0
+        self._pending = 0  # runs waiting to switch to another key
+        self._cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def use(self, key, switch):
+        """
+        Run the enclosed block with the pipeline set up for key, calling
+        switch() first if it is set up for another one. key None runs on
+        whatever the pipeline is set up for.
+        """
+        with self._cond:
+            while True:
+                if key is None or self.key == key:
+                    if not self._pending:
+                        break
+                    self._cond.wait()
+                    continue
+                self._pending += 1
+                try:
+                    while self._running:
+                        self._cond.wait()
+                finally:
+                    self._pending -= 1
+                if self.key != key:
+                    try:
+                        switch()
+                    except BaseException:
+                        self._cond.notify_all()
+                        raise
+                    self.key = key
+                break
+            self._running += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+
+def _rss_bytes():
+    """
+    Current resident set size of this process, or 0 where unavailable.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+class _Slot:
+    __slots__ = ("pipeline", "leases", "last_used", "memory", "ready", "error", "lock")
+
+    def __init__(self):
+        self.pipeline = None
+        self.lock = threading.Lock()  # held by whoever is running the pipeline's agent
+        self.leases = {}  # holder -> last touched (monotonic)
+        self.last_used = time.monotonic()
+        self.memory = 0
+        self.ready = threading.Event()
+        self.error = None
+
+
+class PipelineRegistry:
+    """
+    Reference-counted, LRU-evicted pool of pipelines keyed by target database.
+    max_memory_mb caps the summed memory estimate (RSS growth while building
+    each pipeline); pipelines in use are never evicted, so the caps are soft
+    while every pipeline is leased.
+    """
+
+    def __init__(self, max_pipelines=8, max_memory_mb=None, lease_ttl=3600):
+        self.max_pipelines = max_pipelines
+        self.max_memory = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+        self.lease_ttl = lease_ttl
+        self._slots = OrderedDict()  # key -> _Slot, least recently used first
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.evictions = 0
+
+    def acquire(self, key, holder, build):
+        """
+        Lease the pipeline for key on behalf of holder, building it with
+        build() if no warm one exists. Concurrent acquires of the same key wait
+        for a single build.
+        """
+        with self._lock:
+            slot = self._slots.get(key)
+            owner = slot is None
+            if owner:
+                slot = self._slots[key] = _Slot()
+            slot.leases[holder] = time.monotonic()
+            self._slots.move_to_end(key)
+
+        if owner:
+            try:
+                before = _rss_bytes()
+                slot.pipeline = build()
+                slot.memory = max(_rss_bytes() - before, 0)
+                self.builds += 1
+            except BaseException as e:
+                slot.error = e
+                with self._lock:
+                    self._slots.pop(key, None)
+                raise
+            finally:
+                slot.ready.set()
+            self._evict()
+        else:
+            slot.ready.wait()
+            if slot.error is not None:
+                raise slot.error
+        return slot.pipeline
+
+    def get(self, key, holder):
+        """
+        Return the pipeline leased by holder and refresh the lease, or None if
+        holder has no lease on key (e.g. it expired and the pipeline was evicted).
+        """
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None or holder not in slot.leases or not slot.ready.is_set():
+                return None
+            slot.leases[holder] = slot.last_used = time.monotonic()
+            self._slots.move_to_end(key)
+            return slot.pipeline
+
+    def lock(self, key):
+        """
+        The lock serializing agent runs on key's pipeline. Callers must hold a
+        lease on key, which keeps the pipeline from being evicted.
+        """
+        with self._lock:
+            return self._slots[key].lock
+
+    def release(self, key, holder):
+        """
+        Drop holder's lease; the pipeline stays warm until evicted.
+        """
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                slot.leases.pop(holder, None)
+                slot.last_used = time.monotonic()
+        self._evict()
+
+    def _evict(self):
+        evicted = []
+        with self._lock:
+            now = time.monotonic()
+            for slot in self._slots.values():
+                for holder, touched in list(slot.leases.items()):
+                    if now - touched > self.lease_ttl:
+                        del slot.leases[holder]
+
+            def over_budget():
+                if len(self._slots) > self.max_pipelines:
+                    return True
+                return self.max_memory is not None and sum(s.memory for s in self._slots.values()) > self.max_memory
+
+            for key in list(self._slots):
+                if not over_budget():
+                    break
+                slot = self._slots[key]
+                if slot.leases or not slot.ready.is_set():
+                    continue
+                del self._slots[key]
+                evicted.append((key, slot.pipeline))
+                self.evictions += 1
+        for key, pipeline in evicted:
+            logger.info("Evicting RAG pipeline for %s", key)
+            close = getattr(pipeline, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    logger.exception("Error closing RAG pipeline for %s", key)
+
+    def stats(self):
+        """
+        Number of warm pipelines, live leases and estimated memory.
+        """
+        with self._lock:
+            return {
+                "pipelines": len(self._slots),
+                "leases": sum(len(s.leases) for s in self._slots.values()),
+                "memory_bytes": sum(s.memory for s in self._slots.values()),
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,291 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import functools
+import threading
+import contextlib
+from collections import Counter
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# ------------------- Profiling -------------------
+# Opt-in wall-clock profiling of script reruns. While a rerun is captured, a
+# sampling thread records the stacks of the script thread (and of the agent
+# worker thread while it runs for that rerun) every few milliseconds, and
+# profiled()/section() add wall time per named section. Reruns slower than the
+# threshold are written to disk as JSON with their top stacks and functions.
+# When no capture is active nothing is sampled, and section()/profiled() cost
+# one thread-local lookup.
+
+_local = threading.local()
+_NULL = contextlib.nullcontext()
+
+
+def current_capture():
+    """
+    The Capture active on this thread, or None.
+    """
+    return getattr(_local, "capture", None)
+
+
+def section(name):
+    """
+    Context manager adding the enclosed block's wall time to section name of
+    the active capture; a shared no-op when nothing is being captured.
+    """
+    capture = getattr(_local, "capture", None)
+    if capture is None:
+        return _NULL
+    return capture.section(name)
+
+
+def profiled(name=None):
+    """
+    Decorator timing every call of the function as a section.
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            capture = getattr(_local, "capture", None)
+            if capture is None:
+                return func(*args, **kwargs)
+            with capture.section(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind(func, name):
+    """
+    Wrap func so that, when called on another thread (e.g. run_agent on the
+    agent executor), it is sampled and timed as part of the capture active
+    here. Returns func unchanged when nothing is being captured.
+    """
+    capture = getattr(_local, "capture", None)
+    if capture is None or func is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with capture.profiler.attach(capture, role=name), capture.section(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def annotate(**context):
+    """
+    Add context (e.g. a turn's stage timings) to the active capture, if any.
+    """
+    capture = getattr(_local, "capture", None)
+    if capture is not None:
+        capture.context.update(context)
+
+
+class Capture:
+    """
+    Samples and section timings of one profiled script rerun.
+    """
+
+    def __init__(self, profiler, label, context):
+        self.profiler = profiler
+        self.label = label
+        self.context = dict(context)
+        self.started_at = time.perf_counter()
+        self.duration = None
+        self.outcome = None
+        self.stacks = Counter()  # (role, frames) -> sampled seconds
+        self.samples = 0
+        self.sections = {}  # name -> {"calls": int, "seconds": float}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                entry = self.sections.setdefault(name, {"calls": 0, "seconds": 0.0})
+                entry["calls"] += 1
+                entry["seconds"] += elapsed
+
+    def add_sample(self, role, frames, seconds):
+        with self._lock:
+            self.stacks[(role, frames)] += seconds
+            self.samples += 1
+
+    def summary(self, top_n):
+        """
+        JSON-ready report: top stacks by sampled time, top functions by self
+        and total (inclusive) time, and section timings.
+        """
+        with self._lock:
+            stacks = list(self.stacks.items())
+            sections = {name: dict(entry) for name, entry in self.sections.items()}
+        sampled = sum(seconds for _, seconds in stacks) or 1.0
+        self_time, total_time = Counter(), Counter()
+        for (_, frames), seconds in stacks:
+            if frames:
+                self_time[frames[-1]] += seconds
+            for frame in set(frames):
+                total_time[frame] += seconds
+        stacks.sort(key=lambda item: item[1], reverse=True)
+        return {
+            "label": self.label,
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "duration_seconds": round(self.duration, 6),
+            "threshold_seconds": self.profiler.threshold,
+            "outcome": self.outcome,
+            "context": self.context,
+            "samples": self.samples,
+            "sample_interval_seconds": self.profiler.interval,
+            "sections": {
+                name: {"calls": entry["calls"], "seconds": round(entry["seconds"], 6)}
+                for name, entry in sorted(sections.items(), key=lambda item: item[1]["seconds"], reverse=True)
+            },
+            "top_stacks": [
+                {"thread": role, "seconds": round(seconds, 6), "share": round(seconds / sampled, 4), "stack": list(frames)}
+                for (role, frames), seconds in stacks[:top_n]
+            ],
+            "top_functions": [
+                {"function": frame, "self_seconds": round(self_time[frame], 6), "total_seconds": round(seconds, 6)}
+                for frame, seconds in total_time.most_common(top_n)
+            ],
+        }
+
+
+class SamplingProfiler:
+    """
+    Process-wide sampler shared by all sessions. capture() profiles one rerun;
+    the sampling thread only runs while at least one thread is attached.
+    Captures lasting at least threshold seconds are saved to out_dir, which
+    keeps the newest `keep` files.
+    """
+
+    def __init__(self, out_dir, interval=0.005, threshold=2.0, top_n=25, max_depth=48, keep=200):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.threshold = threshold
+        self.top_n = top_n
+        self.max_depth = max_depth
+        self.keep = keep
+        self.saved = 0
+        self._threads = {}  # thread ident -> (capture, role)
+        self._labels = {}  # code object -> "module.function"
+        self._lock = threading.Lock()
+        self._sampler = None
+
+    @contextlib.contextmanager
+    def capture(self, label="rerun", **context):
+        """
+        Profile the enclosed block on this thread; yields the Capture. The
+        block's exception (including Streamlit's rerun/stop) is recorded as
+        the outcome and re-raised.
+        """
+        capture = Capture(self, label, context)
+        previous = getattr(_local, "capture", None)
+        _local.capture = capture
+        capture.outcome = "ok"
+        try:
+            with self.attach(capture, role="script"):
+                yield capture
+        except BaseException as e:
+            capture.outcome = type(e).__name__
+            raise
+        finally:
+            _local.capture = previous
+            capture.duration = time.perf_counter() - capture.started_at
+            if capture.duration >= self.threshold:
+                self.save(capture)
+
+    @contextlib.contextmanager
+    def attach(self, capture, role):
+        """
+        Sample the current thread into capture for the enclosed block.
+        """
+        ident = threading.get_ident()
+        previous = getattr(_local, "capture", None)
+        _local.capture = capture
+        with self._lock:
+            self._threads[ident] = (capture, role)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+                self._sampler.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads.pop(ident, None)
+            _local.capture = previous
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = self._labels[code] = f"{module}.{code.co_name}"
+        return label
+
+    def _stack(self, frame):
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            # The profiler's own wrappers are left out of the stacks
+            if frame.f_code.co_filename != __file__:
+                frames.append(self._label(frame.f_code))
+            frame = frame.f_back
+        frames.reverse()
+        return tuple(frames)
+
+    def _sample_loop(self):
+        last = time.perf_counter()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._threads:
+                    self._sampler = None
+                    return
+                attached = list(self._threads.items())
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            frames = sys._current_frames()
+            for ident, (capture, role) in attached:
+                frame = frames.get(ident)
+                if frame is not None:
+                    capture.add_sample(role, self._stack(frame), elapsed)
+            del frames
+
+    def save(self, capture):
+        """
+        Write the capture's summary to out_dir; returns the path, or None if
+        it could not be written.
+        """
+        summary = capture.summary(self.top_n)
+        name = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{int(capture.duration * 1000)}ms-{uuid.uuid4().hex[:8]}.json"
+        path = os.path.join(self.out_dir, name)
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2, default=str)
+            os.replace(tmp, path)
+            with self._lock:
+                self.saved += 1
+            self._prune()
+            return path
+        except OSError:
+            logger.exception("Could not save profile to %s", path)
+            return None
+
+    def _prune(self):
+        files = sorted(name for name in os.listdir(self.out_dir) if name.endswith(".json"))
+        for name in files[:max(0, len(files) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.out_dir, name))
+            except OSError:
+                pass
@@ -0,0 +1,106 @@
+import re
+
+import pymysql
+
+# ------------------- Read-Only Query Executor -------------------
+# Runs generated SQL against a user's target database. Only single read
+# statements are accepted, connections are opened in READ ONLY session mode,
+# each statement gets a server-side time limit, and rows are streamed from an
+# unbuffered server-side cursor (SSDictCursor) up to a row limit.
+
+READ_ONLY_STATEMENT = re.compile(r"^\s*(select|with|show|describe|desc|explain)\b", re.IGNORECASE)
+
+# Run on every new connection in a user-database pool
+READ_ONLY_INIT_COMMAND = "SET SESSION TRANSACTION READ ONLY"
+
+
+class QueryRejected(Exception):
+    """Raised for SQL the executor refuses to run (not a single read statement)."""
+
+
+def check_read_only(sql):
+    """
+    Return sql without a trailing semicolon if it is a single read statement,
+    otherwise raise QueryRejected.
+    """
+    statement = sql.strip().rstrip(";").strip()
+    if not READ_ONLY_STATEMENT.match(statement):
+        raise QueryRejected("Only SELECT/WITH/SHOW/DESCRIBE/EXPLAIN statements can be executed")
+    if ";" in re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`", "", statement):
+        raise QueryRejected("Only a single statement can be executed")
+    return statement
+
+
+class ReadOnlyExecutor:
+    """
+    Executes read-only SQL on connections from a ConnectionPool whose
+    connections were opened with READ_ONLY_INIT_COMMAND.
+    timeout_ms is enforced by the server (MAX_EXECUTION_TIME on MySQL,
+    max_statement_time on MariaDB); max_rows caps how many rows are read.
+    """
+
+    def __init__(self, pool, timeout_ms=30000, max_rows=100000):
+        self.pool = pool
+        self.timeout_ms = timeout_ms
+        self.max_rows = max_rows
+        self._timeout_sql = None  # statement that worked on this server
+
+    def _set_timeout(self, cursor):
+        candidates = [self._timeout_sql] if self._timeout_sql else [
+            "SET SESSION MAX_EXECUTION_TIME=%s",  # MySQL 5.7.8+, milliseconds
+            "SET SESSION max_statement_time=%s",  # MariaDB 10.1+, seconds
+        ]
+        for statement in candidates:
+            value = self.timeout_ms if "MAX_EXECUTION_TIME" in statement else self.timeout_ms / 1000
+            try:
+                cursor.execute(statement, (value,))
+                self._timeout_sql = statement
+                return
+            except pymysql.err.MySQLError:
+                continue
+
+    def iter_rows(self, sql, params=None, max_rows=None):
+        """
+        Yield result rows as dicts, streamed from the server.
+        Stops after max_rows (default: the executor's limit). If iteration
+        stops before the result is exhausted, the connection is discarded
+        rather than drained.
+        """
+        statement = check_read_only(sql)
+        limit = self.max_rows if max_rows is None else max_rows
+        conn = self.pool.acquire()
+        exhausted = False
+        try:
+            with conn.cursor() as cursor:
+                self._set_timeout(cursor)
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+            cursor.execute(statement, params)
+            count = 0
+            for row in cursor.fetchall_unbuffered():
+                if count >= limit:
+                    break
+                yield row
+                count += 1
+            else:
+                exhausted = True
+            if exhausted:
+                cursor.close()
+        finally:
+            self.pool.release(conn, discard=not exhausted)
+
+
+def extract_sql(text):
+    """
+    Pull the SQL statement out of an agent answer: the first ```sql fenced
+    block, or the whole answer if it is itself a SELECT ... FROM query.
+    Returns None if no SQL is found.
+    """
+    if not text:
+        return None
+    match = re.search(r"```(?:sql|mysql)\s*\n(.*?)```", text, re.IGNORECASE | re.DOTALL)
+    if match:
+        return match.group(1).strip()
+    # Bare answers only count as SQL when they clearly are a query, not prose
+    if re.match(r"^\s*select\b.+\bfrom\b", text, re.IGNORECASE | re.DOTALL):
+        return text.strip()
+    return None
@@ -0,0 +1,192 @@
+import os
+import json
+import hashlib
+import threading
+
+# ------------------- Incremental RAG Indexing -------------------
+# Adds or removes one document's chunks in the RAG vector store instead of
+# re-reading the whole docs directory. A JSON manifest next to the documents
+# remembers, per file, its content hash and the ids of the chunks it produced.
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexSession:
+    """
+    Chunks for one file, added to the store while its pages are still being
+    extracted. Use through IncrementalIndexer.begin(); the manifest is only
+    updated if the session completes, otherwise its chunks are deleted again.
+    """
+
+    def __init__(self, indexer, file_path, sha256, batch_pages=32):
+        self.indexer = indexer
+        self.file_path = file_path
+        self.sha256 = sha256
+        self.batch_pages = batch_pages
+        self.chunk_ids = []
+        self._pending = []
+
+    def add_page(self, page_number, text):
+        """
+        Queue one page; pages are embedded and added in batches.
+        """
+        if text and text.strip():
+            self._pending.append((page_number, text))
+        if len(self._pending) >= self.batch_pages:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pages, self._pending = self._pending, []
+        self.chunk_ids.extend(self.indexer._add_pages(self.file_path, self.sha256, pages))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._flush()
+            self.indexer._commit(self.file_path, self.sha256, self.chunk_ids)
+        elif self.chunk_ids:
+            self.indexer._delete_ids(self.chunk_ids)
+        return False
+
+
+class IncrementalIndexer:
+    """
+    Incremental index maintenance for a LangChain-style vector store
+    (add_documents(documents, ids=...) and delete(ids=...)).
+    If a splitter with split_documents() is given, pages are split into chunks
+    the same way the pipeline does; otherwise each page is one chunk.
+    """
+
+    def __init__(self, store, manifest_path, splitter=None):
+        self.store = store
+        self.splitter = splitter
+        self.manifest_path = manifest_path
+        self._lock = threading.RLock()
+        self._manifest = self._load_manifest()
+
+    # ---- manifest ----
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"version": 0, "files": {}}
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def version(self):
+        """
+        Corpus version; increases every time the indexed content changes.
+        """
+        return self._manifest["version"]
+
+    def is_indexed(self, file_path, sha256=None):
+        """
+        True if file_path is indexed (with the given content hash, if passed).
+        """
+        entry = self._manifest["files"].get(file_path)
+        return entry is not None and (sha256 is None or entry["sha256"] == sha256)
+
+    def has_content(self, sha256):
+        """
+        True if some indexed file has this content hash.
+        """
+        return any(entry["sha256"] == sha256 for entry in self._manifest["files"].values())
+
+    # ---- public API ----
+
+    def begin(self, file_path, sha256=None):
+        """
+        Start indexing file_path page by page. Returns an IndexSession, or None
+        if the file is already indexed with identical content.
+        Any chunks from a previous version of the file are removed first.
+        """
+        sha256 = sha256 or file_sha256(file_path)
+        with self._lock:
+            if self.is_indexed(file_path, sha256):
+                return None
+            self.remove_file(file_path)
+        return IndexSession(self, file_path, sha256)
+
+    def index_file(self, file_path, pages, sha256=None):
+        """
+        Index one file from an iterable of (page_number, text).
+        Returns False if the content was unchanged and nothing was done.
+        """
+        session = self.begin(file_path, sha256)
+        if session is None:
+            return False
+        with session:
+            for page_number, text in pages:
+                session.add_page(page_number, text)
+        return True
+
+    def index_files(self, files):
+        """
+        Index several changed files; files maps file_path -> iterable of pages.
+        Returns the list of paths that were (re)indexed.
+        """
+        return [path for path, pages in files.items() if self.index_file(path, pages)]
+
+    def remove_file(self, file_path):
+        """
+        Delete every chunk of file_path from the store.
+        Returns True if the file was indexed.
+        """
+        with self._lock:
+            entry = self._manifest["files"].pop(file_path, None)
+            if entry is None:
+                return False
+            self._delete_ids(entry["chunk_ids"])
+            self._manifest["version"] += 1
+            self._save_manifest()
+            return True
+
+    # ---- store access ----
+
+    def _add_pages(self, file_path, sha256, pages):
+        from langchain_core.documents import Document
+
+        documents = [
+            Document(page_content=text, metadata={"source": file_path, "page": page_number, "sha256": sha256})
+            for page_number, text in pages
+        ]
+        if self.splitter is not None:
+            documents = self.splitter.split_documents(documents)
+        ids = []
+        for document in documents:
+            page_number = document.metadata.get("page")
+            ids.append(f"{sha256[:16]}:{page_number}:{len(ids)}")
+        with self._lock:
+            self.store.add_documents(documents, ids=ids)
+        return ids
+
+    def _delete_ids(self, ids):
+        if ids:
+            with self._lock:
+                self.store.delete(ids=ids)
+
+    def _commit(self, file_path, sha256, chunk_ids):
+        with self._lock:
+            self._manifest["files"][file_path] = {"sha256": sha256, "chunk_ids": chunk_ids}
+            self._manifest["version"] += 1
+            self._save_manifest()
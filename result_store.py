@@ -0,0 +1,168 @@
+import os
+import time
+import uuid
+import tempfile
+import threading
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# ------------------- SQL Result Store -------------------
+# Query results are kept inline while small. Larger results are streamed into
+# a Parquet file on local disk, one row group per batch, so only a reference
+# has to be stored in execution_result and pages can be read back lazily.
+
+
+def _stable_field(field):
+    """
+    Widen a type inferred from the first batch so later batches fit: columns
+    that were all NULL are stored as text, and decimals get the maximum
+    precision for their scale (MySQL gives every value of a DECIMAL column
+    the same scale, but not the same number of digits).
+    """
+    if pa.types.is_null(field.type):
+        return pa.field(field.name, pa.string())
+    if pa.types.is_decimal(field.type):
+        if field.type.precision <= 38:
+            return pa.field(field.name, pa.decimal128(38, field.type.scale))
+        return pa.field(field.name, pa.decimal256(76, field.type.scale))
+    return field
+
+
+def _batch_table(rows, schema):
+    if schema is None:
+        table = pa.Table.from_pylist(rows)
+        schema = pa.schema([_stable_field(f) for f in table.schema])
+    text_columns = [f.name for f in schema if pa.types.is_string(f.type)]
+    if text_columns:
+        rows = [
+            {k: (str(v) if v is not None and k in text_columns and not isinstance(v, str) else v) for k, v in row.items()}
+            for row in rows
+        ]
+    return pa.Table.from_pylist(rows, schema=schema), schema
+
+
+def store_rows(rows, result_dir, inline_rows=1000, batch_rows=10000):
+    """
+    Consume an iterable of row dicts.
+    Returns {"columns", "row_count", "rows"} if at most inline_rows rows were
+    produced, otherwise {"columns", "row_count", "result_ref"} where result_ref
+    is the path of a Parquet file written in row groups of batch_rows.
+    """
+    buffered = []
+    rows = iter(rows)
+    for row in rows:
+        buffered.append(row)
+        if len(buffered) > inline_rows:
+            break
+    else:
+        columns = list(buffered[0].keys()) if buffered else []
+        return {"columns": columns, "row_count": len(buffered), "rows": buffered}
+
+    os.makedirs(result_dir, exist_ok=True)
+    path = os.path.join(result_dir, f"{uuid.uuid4().hex}.parquet")
+    writer, schema, row_count = None, None, 0
+    try:
+        batch = buffered
+        while batch:
+            table, schema = _batch_table(batch, schema)
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table)
+            row_count += len(batch)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    break
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    writer.close()
+    return {"columns": schema.names, "row_count": row_count, "result_ref": path}
+
+
+_pruned_at = {}  # result_dir -> time.monotonic() of its last prune
+_prune_lock = threading.Lock()
+
+
+def prune_results(result_dir, max_age=None, max_bytes=None, keep=(), min_interval=0):
+    """
+    Delete stored results older than max_age seconds, then the oldest ones
+    until the directory holds at most max_bytes. Paths in keep are never
+    deleted. A call within min_interval seconds of the last prune of
+    result_dir does nothing. Returns the number of files removed.
+    """
+    if min_interval:
+        with _prune_lock:
+            now = time.monotonic()
+            if result_dir in _pruned_at and now - _pruned_at[result_dir] < min_interval:
+                return 0
+            _pruned_at[result_dir] = now
+    try:
+        names = [name for name in os.listdir(result_dir) if name.endswith(".parquet")]
+    except FileNotFoundError:
+        return 0
+    files = []
+    for name in names:
+        path = os.path.join(result_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+    now = time.time()
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        expired = max_age is not None and now - mtime > max_age
+        over_budget = max_bytes is not None and total > max_bytes
+        if not (expired or over_budget) or path in keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def read_page(path, page, page_size):
+    """
+    Read rows [page * page_size, (page + 1) * page_size) of a stored result as a
+    pandas DataFrame, touching only the row groups that overlap the page.
+    """
+    parquet = pq.ParquetFile(path)
+    start, stop = page * page_size, (page + 1) * page_size
+    groups, offsets, first = [], [], 0
+    for i in range(parquet.metadata.num_row_groups):
+        size = parquet.metadata.row_group(i).num_rows
+        if first < stop and first + size > start:
+            groups.append(i)
+            offsets.append(first)
+        first += size
+    if not groups:
+        return parquet.schema_arrow.empty_table().to_pandas()
+    table = parquet.read_row_groups(groups)
+    return table.slice(start - offsets[0], page_size).to_pandas()
+
+
+def export_csv(path):
+    """
+    Convert a stored result to CSV one row group at a time.
+    Returns an open binary file positioned at the start.
+    """
+    parquet = pq.ParquetFile(path)
+    out = tempfile.TemporaryFile()
+    writer = pa_csv.CSVWriter(out, parquet.schema_arrow)
+    for i in range(parquet.metadata.num_row_groups):
+        writer.write_table(parquet.read_row_group(i))
+    writer.close()
+    out.seek(0)
+    return out
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# ------------------- Schema Metadata Cache -------------------
+# Tables, columns, types and foreign keys of users' target databases, keyed by
+# host/port/database and persisted to local disk. On each use only tables
+# whose information_schema CREATE_TIME changed (DDL rebuilds the table) are
+# re-read, so reconnects and app restarts start warm.
+
+
+def _stamp(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+class SchemaCache:
+    """
+    Process-wide, disk-backed schema cache.
+    get() checks information_schema.TABLES at most once per refresh_interval
+    seconds per database and re-reads columns/foreign keys only for tables
+    that were added or rebuilt since the cached snapshot.
+    """
+
+    def __init__(self, cache_dir, refresh_interval=60):
+        self.cache_dir = cache_dir
+        self.refresh_interval = refresh_interval
+        self._schemas = {}  # key -> schema dict
+        self._checked_at = {}  # key -> monotonic time of last TABLES check
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(host, port, database):
+        return f"{host}:{port}/{database}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"tables": {}, "version": None}
+
+    def _save(self, key, schema):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(schema, f)
+        os.replace(f"{path}.tmp", path)
+
+    def get(self, conn, host, port, database, force=False):
+        """
+        Return the schema of database as
+        {"tables": {name: {"create_time", "update_time", "columns", "foreign_keys"}}, "version"}.
+        conn is an open connection to that database using a dict cursor.
+        """
+        key = self.key(host, port, database)
+        with self._lock:
+            schema = self._schemas.get(key)
+            if schema is None:
+                schema = self._schemas[key] = self._load(key)
+            fresh = time.monotonic() - self._checked_at.get(key, float("-inf")) < self.refresh_interval
+        if fresh and not force:
+            return schema
+
+        schema = self._refresh(conn, database, schema)
+        with self._lock:
+            changed = schema is not self._schemas[key]
+            self._schemas[key] = schema
+            self._checked_at[key] = time.monotonic()
+        if changed:
+            self._save(key, schema)
+        return schema
+
+    def invalidate(self, host, port, database):
+        """
+        Forget the cached schema (memory and disk) of one database.
+        """
+        key = self.key(host, port, database)
+        with self._lock:
+            self._schemas.pop(key, None)
+            self._checked_at.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _refresh(self, conn, database, schema):
+        """
+        Return schema unchanged if nothing was altered, else a new snapshot.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_NAME AS name, CREATE_TIME AS created, UPDATE_TIME AS updated "
+                "FROM information_schema.TABLES WHERE TABLE_SCHEMA=%s",
+                (database,)
+            )
+            current = {row["name"]: row for row in cursor.fetchall()}
+
+            cached = schema["tables"]
+            changed = [
+                name for name, row in current.items()
+                if name not in cached or cached[name]["create_time"] != _stamp(row["created"])
+            ]
+            removed = [name for name in cached if name not in current]
+            if not changed and not removed:
+                return schema
+
+            tables = {name: info for name, info in cached.items() if name in current and name not in changed}
+            for name in changed:
+                tables[name] = {
+                    "create_time": _stamp(current[name]["created"]),
+                    "update_time": _stamp(current[name]["updated"]),
+                    "columns": [],
+                    "foreign_keys": [],
+                }
+            if changed:
+                placeholders = ", ".join(["%s"] * len(changed))
+                cursor.execute(
+                    "SELECT TABLE_NAME AS tbl, COLUMN_NAME AS name, COLUMN_TYPE AS type, IS_NULLABLE AS nullable, COLUMN_KEY AS col_key "
+                    f"FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=%s AND TABLE_NAME IN ({placeholders}) "
+                    "ORDER BY TABLE_NAME, ORDINAL_POSITION",
+                    (database, *changed)
+                )
+                for row in cursor.fetchall():
+                    tables[row["tbl"]]["columns"].append({
+                        "name": row["name"],
+                        "type": row["type"],
+                        "nullable": row["nullable"] == "YES",
+                        "key": row["col_key"],
+                    })
+                cursor.execute(
+                    "SELECT TABLE_NAME AS tbl, COLUMN_NAME AS col, REFERENCED_TABLE_NAME AS ref_table, REFERENCED_COLUMN_NAME AS ref_col "
+                    f"FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA=%s AND TABLE_NAME IN ({placeholders}) "
+                    "AND REFERENCED_TABLE_NAME IS NOT NULL",
+                    (database, *changed)
+                )
+                for row in cursor.fetchall():
+                    tables[row["tbl"]]["foreign_keys"].append({
+                        "column": row["col"],
+                        "references": f"{row['ref_table']}.{row['ref_col']}",
+                    })
+
+        signature = json.dumps(
+            {name: [info["columns"], info["foreign_keys"]] for name, info in sorted(tables.items())},
+            sort_keys=True
+        )
+        return {"tables": tables, "version": hashlib.sha256(signature.encode()).hexdigest()[:16]}
@@ -0,0 +1,173 @@
+import time
+import atexit
+import hashlib
+import logging
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# ------------------- Login Sessions -------------------
+# Server-side login sessions in user_sessions. The Streamlit session holds a
+# random token; only its SHA-256 digest is stored. validate() is called on
+# every rerun, so it answers from an in-memory cache and only checks the
+# database again once an entry is revalidate_interval seconds old; if that
+# check fails, the stale entry is used until the database is back. A revocation made
+# by another process is therefore seen within that interval; one made here
+# takes effect immediately. Expired rows are deleted in batches by a
+# background thread.
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionManager:
+    """
+    Creates, validates and revokes login sessions.
+    lifetime is a session's length in seconds; the cache holds at most
+    max_entries tokens (unknown tokens included, so guessing cannot grow it).
+    """
+
+    def __init__(self, pool, lifetime=86400, revalidate_interval=60, max_entries=10000,
+                 sweep_interval=300, sweep_batch=1000):
+        self.pool = pool
+        self.lifetime = lifetime
+        self.revalidate_interval = revalidate_interval
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._entries = OrderedDict()  # digest -> (user_id or None, expires_at, checked_until)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.swept = 0
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def create(self, user_id, ip_address=None, user_agent=None):
+        """
+        Store a new session for user_id and return its token.
+        """
+        token = secrets.token_hex(32)
+        digest = token_digest(token)
+        expires_at = datetime.now() + timedelta(seconds=self.lifetime)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO user_sessions (user_id, session_token, ip_address, user_agent, expires_at) VALUES (%s, %s, %s, %s, %s)",
+                    (user_id, digest, ip_address, user_agent, expires_at)
+                )
+            conn.commit()
+        self._put(digest, user_id, expires_at)
+        return token
+
+    def validate(self, token):
+        """
+        The user id the session token belongs to, or None if it is unknown,
+        expired or revoked. If the database cannot be reached, a stale cache
+        entry is used; without one the error is raised.
+        """
+        if not token:
+            return None
+        digest = token_digest(token)
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[2] > time.monotonic():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[0] if entry[1] is not None and entry[1] > now else None
+            self.misses += 1
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT user_id, expires_at FROM user_sessions WHERE session_token=%s AND expires_at > %s",
+                        (digest, now)
+                    )
+                    row = cursor.fetchone()
+        except Exception:
+            if entry is None:
+                raise
+            logger.warning("Session revalidation failed; using the cached result", exc_info=True)
+            return entry[0] if entry[1] is not None and entry[1] > now else None
+        if row is None:
+            self._put(digest, None, None)
+            return None
+        self._put(digest, row["user_id"], row["expires_at"])
+        return row["user_id"]
+
+    def revoke(self, token):
+        """
+        End the session; it stops validating here at once.
+        """
+        if not token:
+            return
+        digest = token_digest(token)
+        self._put(digest, None, None)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM user_sessions WHERE session_token=%s", (digest,))
+            conn.commit()
+
+    def _put(self, digest, user_id, expires_at):
+        with self._lock:
+            self._entries[digest] = (user_id, expires_at, time.monotonic() + self.revalidate_interval)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ---- expiry ----
+
+    def sweep(self):
+        """
+        Delete expired sessions sweep_batch rows at a time, committing after
+        each batch, and drop expired cache entries. Returns the rows deleted.
+        """
+        now = datetime.now()
+        deleted = 0
+        while True:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "DELETE FROM user_sessions WHERE expires_at <= %s LIMIT %s",
+                        (now, self.sweep_batch)
+                    )
+                    count = cursor.rowcount
+                conn.commit()
+            deleted += max(count, 0)
+            if count < self.sweep_batch:
+                break
+        with self._lock:
+            expired = [d for d, (_, expires_at, _) in self._entries.items() if expires_at is not None and expires_at <= now]
+            for digest in expired:
+                del self._entries[digest]
+            self.swept += deleted
+        return deleted
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Expired session sweep failed")
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "swept": self.swept,
+            }
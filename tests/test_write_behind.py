@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [REPO_DIR, os.path.join(REPO_DIR, "benchmarks")]
+
+from db_pool import ConnectionPool  # noqa: E402
+from sqlite_db import Connection, create_database  # noqa: E402
+from write_behind import TelemetryWriter  # noqa: E402
+from conversation_store import ConversationStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "app.sqlite3")
+    create_database(path)
+    pool = ConnectionPool(lambda: Connection(path))
+    # A long flush interval puts everything submitted by a test in one batch
+    writer = TelemetryWriter(pool, flush_interval=0.5)
+    yield ConversationStore(pool, writer)
+    writer.close()
+
+
+def test_rows_queued_after_a_delete_survive_it(store):
+    store.save_header(7, "old", "Old chat")
+    store.append_message("old", {"role": "user", "content": "before"})
+    store.delete_all(7)
+    store.save_header(7, "new", "New chat")
+    message = store.append_message("new", {"role": "user", "content": "after"})
+    store.writer.flush(timeout=5)
+
+    assert [h["id"] for h in store.list_headers(7)] == ["new"]
+    messages, _ = store.load_messages(7, "new")
+    assert [(m["id"], m["content"]) for m in messages] == [(message.result(1), "after")]
+    assert store.load_messages(7, "old") == ([], False)
+
+
+def test_rename_applies_after_earlier_upserts_only(store):
+    store.save_header(7, "c1", "New Chat")
+    store.rename(7, "c1", "Renamed")
+    store.writer.flush(timeout=5)
+    assert [h["title"] for h in store.list_headers(7)] == ["Renamed"]
+
+    store.rename(7, "c1", "Renamed again")
+    store.save_header(7, "c1", "Newest title")
+    store.writer.flush(timeout=5)
+    assert [h["title"] for h in store.list_headers(7)] == ["Newest title"]
@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+# ------------------- Turn Timing -------------------
+# Per-stage latencies of one chat turn, measured with a monotonic clock.
+# The summary is stored in execution_result so slow or failing stages can be
+# queried and alerted on.
+
+
+class TurnTimer:
+    """
+    Collects the duration and outcome of each stage of a chat turn.
+    Stages can be timed with the stage() context manager or recorded from
+    durations measured elsewhere with record().
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.stages = {}  # name -> {"seconds": float, "ok": bool, "error": str|None}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block as stage name. An exception marks the stage
+        failed, records its message and is re-raised.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            raise
+        self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds, error=None):
+        """
+        Add seconds to stage name; an error message marks the stage failed.
+        """
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "ok": True, "error": None})
+        entry["seconds"] += seconds
+        if error:
+            entry["ok"] = False
+            entry["error"] = error
+
+    @property
+    def success(self):
+        return all(entry["ok"] for entry in self.stages.values())
+
+    @property
+    def error_message(self):
+        """
+        "stage: message" for every failed stage, or None.
+        """
+        errors = [f"{name}: {entry['error']}" for name, entry in self.stages.items() if not entry["ok"]]
+        return "; ".join(errors) or None
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self._start
+
+    @property
+    def execution_time(self):
+        """
+        Total turn duration as a timedelta (stored in execution_result.execution_time).
+        """
+        return timedelta(seconds=self.total_seconds)
+
+    def as_dict(self):
+        return {
+            "total_seconds": round(self.total_seconds, 6),
+            "success": self.success,
+            "stages": {
+                name: {"seconds": round(entry["seconds"], 6), "ok": entry["ok"], "error": entry["error"]}
+                for name, entry in self.stages.items()
+            },
+        }
@@ -0,0 +1,40 @@
+import os
+import hashlib
+import tempfile
+
+# ------------------- Content-Addressed Upload Store -------------------
+# Uploads are stored under the SHA-256 of their content, so re-uploading the
+# same bytes is detected without re-extracting or re-indexing them, and two
+# different files that share a name can no longer overwrite each other.
+
+
+def store_upload(fileobj, root, original_name, chunk_size=1024 * 1024):
+    """
+    Stream an uploaded file into root/<sha256><ext>, hashing it on the way.
+    Returns (sha256, file_path, is_new); is_new is False if identical content
+    was already stored.
+    """
+    os.makedirs(root, exist_ok=True)
+    ext = os.path.splitext(original_name)[1].lower()
+    digest = hashlib.sha256()
+
+    fileobj.seek(0)
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=root)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for block in iter(lambda: fileobj.read(chunk_size), b""):
+                digest.update(block)
+                f.write(block)
+        sha256 = digest.hexdigest()
+        file_path = os.path.join(root, f"{sha256}{ext}")
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+            return sha256, file_path, False
+        os.replace(tmp_path, file_path)
+        return sha256, file_path, True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        fileobj.seek(0)
@@ -0,0 +1,68 @@
+import time
+import threading
+from collections import OrderedDict
+
+# ------------------- User Record Cache -------------------
+# Process-wide cache of rows from the users table, keyed by user id.
+# Entries expire after ttl seconds so changes made by other processes show up
+# eventually; changes made by this process call invalidate() right away.
+
+
+class UserCache:
+    """
+    Small thread-safe TTL + LRU cache of user records.
+    load(user_id) is called on a miss and should return the record dict or None.
+    """
+
+    def __init__(self, load, ttl=300, max_entries=10000):
+        self._load = load
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (record, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """
+        Return the user record for user_id, loading it on a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        record = self._load(user_id)
+        if record is not None:
+            self.put(record)
+        return record
+
+    def put(self, record):
+        """
+        Store a freshly read record (must contain "id").
+        """
+        with self._lock:
+            self._entries[record["id"]] = (record, time.monotonic() + self.ttl)
+            self._entries.move_to_end(record["id"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """
+        Drop the cached record for user_id after an account change.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,368 @@
+import time
+import queue
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# ------------------- Write-Behind Telemetry -------------------
+# Chat telemetry (inputs -> predictions -> execution_result) and conversation
+# history do not affect what the user sees, so they are queued here and
+# written by a background thread in multi-row INSERTs. Parent ids are handed
+# around as Futures until the parent row has been written. Updates and deletes
+# that must not overtake queued rows go through the same queue; a batch is
+# split at them, so they run in queue order relative to the INSERTs.
+
+# table -> columns; the first column of a child table references its parent
+TABLES = {
+    "conversations": ("id", "user_id", "title", "updated_at"),
+    "inputs": ("user_id", "input_type", "input_txt", "file_path"),
+    "predictions": ("input_id", "generated_sql"),
+    "execution_result": ("prediction_id", "result_json", "execution_time", "success", "error_message"),
+    "conversation_messages": ("prediction_id", "conversation_id", "role", "content", "meta"),
+    "conversation_summaries": ("conversation_id", "summary", "upto_message_id", "updated_at"),
+}
+# Parents are always written before their children within a batch
+TABLE_ORDER = (
+    "conversations", "inputs", "predictions", "execution_result",
+    "conversation_messages", "conversation_summaries"
+)
+# Tables keyed by application-chosen ids: rows are upserted and their
+# Futures resolve to None
+UPSERT = {
+    "conversations": "title = VALUES(title), updated_at = VALUES(updated_at)",
+    "conversation_summaries": "summary = VALUES(summary), upto_message_id = VALUES(upto_message_id), updated_at = VALUES(updated_at)",
+}
+# Children that are still written, with a NULL reference, if their parent failed
+OPTIONAL_PARENT = {"conversation_messages"}
+
+_FLUSH = object()
+_STOP = object()
+
+
+class TelemetryDropped(RuntimeError):
+    """Set on the Future of a record dropped because the queue stayed full."""
+
+
+def dropped(ref):
+    """
+    Whether ref is the Future of a record the writer dropped.
+    """
+    return isinstance(ref, Future) and ref.done() and isinstance(ref.exception(), TelemetryDropped)
+
+
+def resolve(ref, timeout=None):
+    """
+    Return the row id behind ref, waiting for the writer if ref is a Future.
+    """
+    if isinstance(ref, Future):
+        return ref.result(timeout=timeout)
+    return ref
+
+
+def settled(ref):
+    """
+    The row id behind ref if it is known without waiting: ref itself, or the
+    result of a Future that completed successfully. None while the write is
+    pending or if it failed.
+    """
+    if isinstance(ref, Future):
+        if not ref.done() or ref.cancelled() or ref.exception() is not None:
+            return None
+        return ref.result()
+    return ref
+
+
+class _Record:
+    # table is None for a submit_statements record; values then holds (sql, params) pairs
+    __slots__ = ("table", "values", "parent", "future")
+
+    def __init__(self, table, values, parent=None):
+        self.table = table
+        self.values = values
+        self.parent = parent
+        self.future = Future()
+
+
+class TelemetryWriter:
+    """
+    Background writer that batches telemetry rows into multi-row INSERTs.
+    A batch is closed after max_batch records or flush_interval seconds,
+    whichever comes first, and committed as a single transaction.
+    The queue holds at most max_queue records; submit_* blocks for up to
+    put_timeout seconds when it is full and then drops the record: its Future
+    fails with TelemetryDropped and stats()["dropped"] counts it. Until the
+    queue has room again, further records are dropped without waiting.
+    If latency (a metrics Histogram) is given, every INSERT is observed
+    labelled with its table, and every commit with table="commit".
+    """
+
+    def __init__(self, pool, max_batch=200, flush_interval=0.05, max_queue=5000, put_timeout=5, latency=None):
+        self.pool = pool
+        self.latency = latency
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._autoinc_step = None
+        self._closed = False
+
+        self._batches = 0
+        self._rows = 0
+        self._failed_rows = 0
+        self._dropped = 0
+        self._full = False  # the last put timed out; don't wait again until one succeeds
+
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---- producer API ----
+
+    def submit_input(self, user_id, input_type, input_txt=None, file_path=None):
+        """
+        Queue an inputs row. Returns a Future resolving to its id.
+        """
+        return self._put(_Record("inputs", (user_id, input_type, input_txt, file_path)))
+
+    def submit_prediction(self, input_ref, generated_sql):
+        """
+        Queue a predictions row. input_ref may be an id or the Future from submit_input.
+        Returns a Future resolving to the prediction id.
+        """
+        return self._put(_Record("predictions", (None, generated_sql), parent=input_ref))
+
+    def submit_execution_result(self, prediction_ref, result_json, execution_time, success, error_message=None):
+        """
+        Queue an execution_result row. prediction_ref may be an id or a Future
+        from submit_prediction. Returns a Future resolving to its id.
+        """
+        return self._put(_Record(
+            "execution_result",
+            (None, result_json, execution_time, success, error_message),
+            parent=prediction_ref
+        ))
+
+    def submit_conversation(self, conversation_id, user_id, title, updated_at):
+        """
+        Queue an upsert of a conversation header. Returns a Future resolving to None.
+        """
+        return self._put(_Record("conversations", (conversation_id, user_id, title, updated_at)))
+
+    def submit_message(self, conversation_id, role, content, meta=None, prediction_ref=None):
+        """
+        Queue a conversation_messages row. meta is a JSON string; prediction_ref
+        may be an id or a Future from submit_prediction.
+        Returns a Future resolving to the message id.
+        """
+        return self._put(_Record(
+            "conversation_messages",
+            (None, conversation_id, role, content, meta),
+            parent=prediction_ref
+        ))
+
+    def submit_summary(self, conversation_id, summary, upto_message_id, updated_at):
+        """
+        Queue an upsert of a conversation's rolling summary. Returns a Future resolving to None.
+        """
+        return self._put(_Record("conversation_summaries", (conversation_id, summary, upto_message_id, updated_at)))
+
+    def submit_statements(self, statements):
+        """
+        Queue (sql, params) statements, e.g. an UPDATE or DELETE of rows that
+        may still be queued. They run in one transaction of their own, after
+        everything queued before them and before anything queued after them.
+        Returns a Future resolving to None.
+        """
+        return self._put(_Record(None, list(statements)))
+
+    def _put(self, record):
+        if self._closed:
+            raise RuntimeError("TelemetryWriter is closed")
+        try:
+            if self._full:
+                self._queue.put_nowait(record)
+            else:
+                self._queue.put(record, timeout=self.put_timeout)
+        except queue.Full:
+            self._full = True
+            self._dropped += 1
+            record.future.set_exception(TelemetryDropped(f"Telemetry queue full; {record.table or 'statement'} record dropped"))
+            return record.future
+        self._full = False
+        return record.future
+
+    def flush(self, timeout=None):
+        """
+        Block until everything queued so far has been written.
+        """
+        done = threading.Event()
+        self._queue.put((_FLUSH, done), timeout=timeout)
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        """
+        Write out everything still queued and stop the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """
+        Snapshot of writer throughput and backlog.
+        """
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self._batches,
+            "rows": self._rows,
+            "failed_rows": self._failed_rows,
+            "dropped": self._dropped,
+        }
+
+    # ---- writer thread ----
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, tuple) and item[0] is _FLUSH:
+                    waiters.append(item[1])
+                else:
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if stopping:
+                # Drain whatever was queued before close()
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, _Record):
+                        batch.append(item)
+                    elif isinstance(item, tuple):
+                        waiters.append(item[1])
+            for start in range(0, len(batch), self.max_batch):
+                self._write_batch(batch[start:start + self.max_batch])
+            for done in waiters:
+                done.set()
+
+    def _write_batch(self, batch):
+        # Rows queued before a statement are written before it, the rest after it
+        rows = []
+        for record in batch:
+            if record.table is None:
+                self._write_rows(rows)
+                rows = []
+                self._execute(record)
+            else:
+                rows.append(record)
+        self._write_rows(rows)
+
+    def _write_rows(self, batch):
+        if not batch:
+            return
+        ids = {}  # id(future) -> row id assigned in this batch
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    if self._autoinc_step is None:
+                        cursor.execute("SELECT @@auto_increment_increment AS step")
+                        self._autoinc_step = int(cursor.fetchone()["step"])
+                    for table in TABLE_ORDER:
+                        rows = []
+                        for record in batch:
+                            if record.table != table:
+                                continue
+                            values = record.values
+                            if record.parent is not None:
+                                parent_id = self._parent_id(record.parent, ids)
+                                if parent_id is None and table not in OPTIONAL_PARENT:
+                                    record.future.set_exception(RuntimeError(f"Parent of {table} row was not written"))
+                                    self._failed_rows += 1
+                                    continue
+                                values = (parent_id,) + values[1:]
+                            rows.append((record, values))
+                        if not rows:
+                            continue
+                        columns = TABLES[table]
+                        placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+                        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([placeholders] * len(rows))
+                        if table in UPSERT:
+                            sql += f" ON DUPLICATE KEY UPDATE {UPSERT[table]}"
+                        start = time.perf_counter()
+                        cursor.execute(sql, [v for _, values in rows for v in values])
+                        self._observe(table, start)
+                        if table in UPSERT:
+                            for record, _ in rows:
+                                ids[id(record.future)] = None
+                            continue
+                        # A multi-row INSERT with a known row count reserves a
+                        # consecutive auto-increment block starting at lastrowid.
+                        first_id = cursor.lastrowid
+                        for i, (record, _) in enumerate(rows):
+                            ids[id(record.future)] = first_id + i * self._autoinc_step
+                start = time.perf_counter()
+                conn.commit()
+                self._observe("commit", start)
+        except Exception as e:
+            logger.exception("Telemetry batch of %d rows failed", len(batch))
+            for record in batch:
+                if not record.future.done():
+                    record.future.set_exception(e)
+                    self._failed_rows += 1
+            return
+        written = 0
+        for record in batch:
+            if not record.future.done():
+                record.future.set_result(ids[id(record.future)])
+                written += 1
+        self._batches += 1
+        self._rows += written
+
+    def _execute(self, record):
+        start = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    for sql, params in record.values:
+                        cursor.execute(sql, params)
+                conn.commit()
+        except Exception as e:
+            logger.exception("Queued statements failed")
+            record.future.set_exception(e)
+            self._failed_rows += 1
+            return
+        self._observe("statements", start)
+        record.future.set_result(None)
+
+    def _observe(self, table, start):
+        if self.latency is not None:
+            self.latency.observe(time.perf_counter() - start, table=table)
+
+    @staticmethod
+    def _parent_id(parent, ids):
+        if not isinstance(parent, Future):
+            return parent
+        if id(parent) in ids:
+            return ids[id(parent)]
+        if parent.done() and parent.exception() is None:
+            return parent.result()
+        return None